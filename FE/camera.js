@@ -4,12 +4,99 @@ document.addEventListener("DOMContentLoaded", function () {
   const btnEmotion = document.getElementById("btnEmotion");
   const btnEndCall = document.getElementById("btnEndCall");
 
-  // Nhận diện cảm xúc giả lập bằng emoji
-  const emotions = ["😊", "😐", "😞", "😃", "😢", "😲", "😠", "😴"];
+  // Nhận diện cảm xúc thời gian thực qua WebSocket
+  const LIVE_URL = "ws://127.0.0.1:8000/live/ws";
+  // Khoảng cách giữa hai lần gửi khung hình (ms) và chất lượng JPEG
+  const FRAME_INTERVAL = 200;
+  const JPEG_QUALITY = 0.7;
+  // Không gửi thêm khi còn dữ liệu chưa gửi hết (mạng chậm)
+  const MAX_BUFFERED_BYTES = 256 * 1024;
 
+  const emotionEmoji = {
+    angry: "😠",
+    disgust: "😒",
+    fear: "😨",
+    happy: "😃",
+    sad: "😢",
+    surprise: "😲",
+    neutral: "😐",
+  };
+
+  const canvas = document.createElement("canvas");
+  const context = canvas.getContext("2d");
+  let socket = null;
+  let sendTimer = null;
+
+  function sendFrame() {
+    if (!socket || socket.readyState !== WebSocket.OPEN) return;
+    if (socket.bufferedAmount > MAX_BUFFERED_BYTES) return;
+    if (!studentVideo.videoWidth) return;
+
+    canvas.width = studentVideo.videoWidth;
+    canvas.height = studentVideo.videoHeight;
+    context.drawImage(studentVideo, 0, 0, canvas.width, canvas.height);
+    canvas.toBlob(
+      (blob) => {
+        if (blob && socket && socket.readyState === WebSocket.OPEN) {
+          socket.send(blob);
+        }
+      },
+      "image/jpeg",
+      JPEG_QUALITY
+    );
+  }
+
+  function showResult(message) {
+    if (message.type !== "result") return;
+    if (message.faces.length === 0) {
+      emotionOverlay.textContent = "";
+      return;
+    }
+    // Hiển thị cảm xúc của khuôn mặt lớn nhất
+    const face = message.faces.reduce((a, b) =>
+      a.face_coordinates.width >= b.face_coordinates.width ? a : b
+    );
+    emotionOverlay.textContent = emotionEmoji[face.emotion] || "";
+  }
+
+  function stopLive() {
+    clearInterval(sendTimer);
+    sendTimer = null;
+    if (socket) socket.close();
+    socket = null;
+    emotionOverlay.textContent = "";
+  }
+
+  function startLive() {
+    const token = localStorage.getItem("accessToken");
+    if (!token) {
+      // Camera vẫn hoạt động, chỉ nhận diện cảm xúc cần đăng nhập
+      if (confirm("Vui lòng đăng nhập để nhận diện cảm xúc. Đăng nhập ngay?")) {
+        window.location.href = "login.html";
+      }
+      return;
+    }
+
+    socket = new WebSocket(`${LIVE_URL}?token=${encodeURIComponent(token)}`);
+    socket.onmessage = (event) => showResult(JSON.parse(event.data));
+    socket.onclose = (event) => {
+      if (event.code === 1008) {
+        // Token hết hạn hoặc không hợp lệ, bỏ để lần sau đăng nhập lại
+        localStorage.removeItem("accessToken");
+        alert("Phiên đăng nhập đã hết hạn!");
+      }
+      stopLive();
+    };
+    sendTimer = setInterval(sendFrame, FRAME_INTERVAL);
+  }
+
+  // Bật/tắt nhận diện cảm xúc
   btnEmotion.addEventListener("click", () => {
-    const randomEmotion = emotions[Math.floor(Math.random() * emotions.length)];
-    emotionOverlay.textContent = randomEmotion;
+    if (socket) {
+      stopLive();
+    } else {
+      startLive();
+    }
   });
 
   // Mở camera
@@ -34,6 +121,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
   // Sự kiện rời khỏi lớp
   btnEndCall.addEventListener("click", () => {
+    stopLive();
     alert("Bạn đã rời khỏi lớp học!");
     window.location.href = "https://www.google.com"; // Điều hướng về trang khác
   });
@@ -1,21 +1,45 @@
+// Địa chỉ API đăng nhập (xem app/routers/auth.py)
+const TOKEN_URL = "http://127.0.0.1:8000/auth/token";
+
 document
   .getElementById("loginForm")
-  .addEventListener("submit", function (event) {
+  .addEventListener("submit", async function (event) {
     event.preventDefault();
 
     // Lấy thông tin từ form
-    const studentName = document.getElementById("studentName").value.trim();
-    const classCode = document.getElementById("classCode").value.trim();
+    const username = document.getElementById("studentID").value.trim();
+    const password = document.getElementById("password").value;
 
     // Kiểm tra dữ liệu hợp lệ
-    if (studentName === "" || classCode === "") {
+    if (username === "" || password === "") {
       alert("Vui lòng nhập đầy đủ thông tin!");
       return;
     }
 
+    // Lấy token truy cập, dùng cho nhận diện cảm xúc thời gian thực
+    let response;
+    try {
+      response = await fetch(TOKEN_URL, {
+        method: "POST",
+        headers: { "Content-Type": "application/x-www-form-urlencoded" },
+        body: new URLSearchParams({ username, password }),
+      });
+    } catch (error) {
+      console.error("Lỗi kết nối server: ", error);
+      alert("Không kết nối được tới server!");
+      return;
+    }
+
+    if (!response.ok) {
+      alert("Tên đăng nhập hoặc mật khẩu không chính xác!");
+      return;
+    }
+
+    const data = await response.json();
+
     // Lưu thông tin vào localStorage (để chuyển sang trang học)
-    localStorage.setItem("studentName", studentName);
-    localStorage.setItem("classCode", classCode);
+    localStorage.setItem("accessToken", data.access_token);
+    localStorage.setItem("studentName", username);
 
     // Chuyển sang giao diện lớp học
     window.location.href = "student.html";
@@ -0,0 +1,102 @@
+import sys
+import os
+from datetime import date, datetime
+from sqlalchemy import create_engine, func, select, text
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import Base
+from models.user import User
+from models.video import Video, EmotionData, SessionData, EmotionReport
+from migrations import run_migrations
+
+
+def hot_queries():
+    """Các truy vấn của endpoint báo cáo và phân tích video, kèm index cần dùng"""
+    day_start = datetime.combine(date.today(), datetime.min.time())
+    day_end = datetime.combine(date.today(), datetime.max.time())
+
+    return [
+        (
+            "GET /reports/sessions",
+            select(SessionData)
+            .where(SessionData.user_id == 1, SessionData.start_time >= day_start)
+            .order_by(SessionData.start_time.desc()),
+            "ix_session_data_user_id_start_time",
+        ),
+        (
+            "POST /reports/generate-daily-report (sessions)",
+            select(SessionData).where(
+                SessionData.user_id == 1,
+                SessionData.start_time >= day_start,
+                SessionData.start_time <= day_end,
+                SessionData.end_time.isnot(None),
+            ),
+            "ix_session_data_user_id_start_time",
+        ),
+        (
+            "GET /reports/daily",
+            select(EmotionReport)
+            .where(
+                EmotionReport.user_id == 1,
+                EmotionReport.report_date >= date.today(),
+                EmotionReport.report_date <= date.today(),
+            )
+            .order_by(EmotionReport.report_date),
+            "uq_emotion_reports_user_id_report_date",
+        ),
+        (
+            "GET /videos/",
+            select(Video).where(Video.user_id == 1).order_by(Video.created_at),
+            "ix_videos_user_id_created_at",
+        ),
+        (
+            "GET /videos/{id}/emotions",
+            select(EmotionData)
+            .where(EmotionData.video_id == 1)
+            .order_by(EmotionData.timestamp),
+            "ix_emotion_data_video_id_timestamp",
+        ),
+        (
+            "GET /videos/{id}/analysis",
+            select(EmotionData.emotion, func.count())
+            .where(EmotionData.video_id == 1)
+            .group_by(EmotionData.emotion),
+            "ix_emotion_data_video_id_emotion",
+        ),
+    ]
+
+
+def check_query_plans(engine):
+    """Chạy EXPLAIN QUERY PLAN (SQLite) cho từng truy vấn, trả về kết quả"""
+    results = []
+    with engine.connect() as conn:
+        for name, query, index_name in hot_queries():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            uses_index = any(index_name in detail for detail in plan)
+            # Truy vấn có ORDER BY không được sắp xếp lại bằng bảng tạm
+            sorts = any("TEMP B-TREE" in detail for detail in plan)
+            results.append((name, uses_index and not sorts, plan))
+
+    return results
+
+
+if __name__ == "__main__":
+    try:
+        print("Checking query plans...")
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+
+        results = check_query_plans(engine)
+        for name, ok, plan in results:
+            print(f"[{'OK' if ok else 'FAIL'}] {name}")
+            for detail in plan:
+                print(f"    {detail}")
+
+        if not all(ok for _, ok, _ in results):
+            sys.exit(1)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
@@ -8,6 +8,23 @@ load_dotenv()
 DATABASE_URL = os.getenv(
     "DATABASE_URL", "mysql+pymysql://root:@localhost/emotion_detection"
 )
+# URL cho engine bất đồng bộ, mặc định suy ra từ DATABASE_URL
+# (mysql+pymysql -> mysql+aiomysql, sqlite -> sqlite+aiosqlite)
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("mysql+pymysql://", "mysql+aiomysql://", 1).replace(
+        "sqlite://", "sqlite+aiosqlite://", 1
+    ),
+)
+# Connection pool (không áp dụng cho SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Thời gian chờ tối đa (giây) để lấy kết nối từ pool
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Tạo lại kết nối sau số giây này, nhỏ hơn wait_timeout của MySQL
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Kiểm tra kết nối trước khi dùng để bỏ kết nối đã bị server đóng
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
 
 # Cấu hình bảo mật
 SECRET_KEY = os.getenv("SECRET_KEY", "thuc-tap-program")
@@ -22,3 +39,175 @@ MODEL_PATH = os.getenv(
 
 # Cấu hình TensorRT
 EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+# Cấu hình suy luận theo lô (batch)
+# Số khuôn mặt tối đa trong một lần gọi model
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
+# Số khung hình lấy mẫu được gom chung vào một lô khi xử lý video
+BATCH_WINDOW = int(os.getenv("BATCH_WINDOW", "4"))
+
+# Cấu hình backend suy luận: tensorrt (GPU), onnx (CPU) hoặc fake (kiểm thử)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "tensorrt")
+# Số luồng CPU cho backend onnx (0 = để thư viện tự chọn)
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))
+ONNX_MODEL_PATH = os.getenv(
+    "ONNX_MODEL_PATH", "C:/Users/ha161/CodeTest/TTTTN/app/model/emotion_model.onnx"
+)
+# Kích thước đầu vào của model dạng (channels, height, width)
+MODEL_INPUT_SIZE = tuple(
+    int(dim) for dim in os.getenv("MODEL_INPUT_SIZE", "1,48,48").split(",")
+)
+
+# Cấu hình lấy mẫu khung hình khi xử lý video
+# read: giải mã mọi frame (cách cũ), grab: bỏ qua frame không cần bằng grab(),
+# seek: nhảy thẳng tới frame cần lấy, auto: chọn seek khi khoảng cách đủ dài
+FRAME_SAMPLING = os.getenv("FRAME_SAMPLING", "auto")
+# Số frame tối thiểu giữa hai mẫu để chế độ auto chuyển sang seek
+SEEK_MIN_INTERVAL_FRAMES = int(os.getenv("SEEK_MIN_INTERVAL_FRAMES", "150"))
+
+# Lấy mẫu thích ứng theo chuyển động: dày khi khung hình thay đổi, thưa khi
+# đứng yên (thay cho khoảng cách cố định interval)
+ADAPTIVE_SAMPLING = os.getenv("ADAPTIVE_SAMPLING", "false").lower() == "true"
+# Khoảng cách nhỏ nhất (giây) giữa hai mẫu, cũng là chu kỳ đo chuyển động
+ADAPTIVE_MIN_INTERVAL = float(os.getenv("ADAPTIVE_MIN_INTERVAL", "0.25"))
+# Khoảng cách lớn nhất (giây) giữa hai mẫu khi khung hình không đổi
+ADAPTIVE_MAX_INTERVAL = float(os.getenv("ADAPTIVE_MAX_INTERVAL", "2"))
+# Mức thay đổi (0-1) so với mẫu trước để lấy mẫu mới; nhỏ hơn thì lấy mẫu
+# dày hơn
+ADAPTIVE_MOTION_THRESHOLD = float(os.getenv("ADAPTIVE_MOTION_THRESHOLD", "0.03"))
+
+# Cấu hình pipeline xử lý video (giải mã / nhận diện khuôn mặt / suy luận)
+VIDEO_PIPELINE = os.getenv("VIDEO_PIPELINE", "true").lower() == "true"
+# Số luồng chạy nhận diện khuôn mặt và tiền xử lý
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", str(os.cpu_count() or 2)))
+# Số khung hình tối đa đang chờ giữa các giai đoạn (giới hạn bộ nhớ)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+
+# Cấu hình theo dõi khuôn mặt giữa các khung hình lấy mẫu
+FACE_TRACKING = os.getenv("FACE_TRACKING", "false").lower() == "true"
+# Số mẫu giữa hai lần nhận diện khuôn mặt trên toàn khung hình
+TRACKING_DETECT_EVERY = int(os.getenv("TRACKING_DETECT_EVERY", "5"))
+# Ngưỡng IoU để coi là cùng một khuôn mặt
+TRACKING_IOU_THRESHOLD = float(os.getenv("TRACKING_IOU_THRESHOLD", "0.3"))
+# Số mẫu liên tiếp mất dấu trước khi bỏ track
+TRACKING_MAX_MISSED = int(os.getenv("TRACKING_MAX_MISSED", "2"))
+
+# Cấu hình nhận diện khuôn mặt (có thể ghi đè riêng cho từng video)
+DETECTION_PARAMS = {
+    # Chiều rộng tối đa của ảnh dùng để nhận diện, ảnh lớn hơn sẽ được thu nhỏ
+    "max_width": int(os.getenv("DETECTION_MAX_WIDTH", "640")),
+    # Kích thước khuôn mặt nhỏ nhất theo tỉ lệ cạnh ngắn của khung hình
+    "min_face_ratio": float(os.getenv("DETECTION_MIN_FACE_RATIO", "0.04")),
+    # Kích thước khuôn mặt nhỏ nhất tuyệt đối (pixel của khung hình gốc)
+    "min_face_size": int(os.getenv("DETECTION_MIN_FACE_SIZE", "30")),
+    # Tham số pyramid của detectMultiScale
+    "scale_factor": float(os.getenv("DETECTION_SCALE_FACTOR", "1.1")),
+    "min_neighbors": int(os.getenv("DETECTION_MIN_NEIGHBORS", "5")),
+}
+
+# Cấu hình chia video dài cho nhiều tiến trình xử lý song song
+VIDEO_SHARDING = os.getenv("VIDEO_SHARDING", "false").lower() == "true"
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(os.cpu_count() or 2)))
+# Mỗi worker nhận vài đoạn để cân bằng tải khi các đoạn xử lý nhanh chậm khác nhau
+SHARD_SEGMENTS_PER_WORKER = int(os.getenv("SHARD_SEGMENTS_PER_WORKER", "2"))
+# Chỉ chia video dài hơn ngưỡng này (giây)
+SHARD_MIN_DURATION = float(os.getenv("SHARD_MIN_DURATION", "600"))
+
+# Cấu hình hàng đợi xử lý video chạy nền
+# Thư mục dữ liệu nội bộ (không public như UPLOAD_FOLDER)
+DATA_FOLDER = os.getenv("DATA_FOLDER", "data")
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(DATA_FOLDER, "jobs.sqlite3"))
+# Số video được xử lý đồng thời
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+# Chu kỳ (giây) worker kiểm tra lại hàng đợi khi không được đánh thức
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# Chu kỳ (giây) worker báo job đang chạy vẫn còn sống
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+# Job đang chạy mà quá số giây này không có heartbeat được coi là worker đã
+# chết và được worker khác nhận lại
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))
+
+# Cấu hình tải lên video
+# Dung lượng tối đa của một video (byte), mặc định 2 GB
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(2 * 1024**3)))
+# Kích thước mỗi khối khi ghi file tải lên xuống đĩa (byte)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024**2)))
+
+# Số dòng EmotionData trong mỗi câu lệnh INSERT nhiều dòng
+EMOTION_INSERT_CHUNK_SIZE = int(os.getenv("EMOTION_INSERT_CHUNK_SIZE", "5000"))
+
+# Cách lưu kết quả nhận diện của video:
+# rows: từng dòng emotion_data, timeline: mảng cột nén cạnh file video, both: cả hai
+EMOTION_STORAGE = os.getenv("EMOTION_STORAGE", "both")
+
+# Cache kết quả phân tích video trong tiến trình
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "1024"))
+# Thời gian sống của mỗi kết quả trong cache (giây)
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "600"))
+
+# Phân trang danh sách (keyset/cursor)
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+# Số dòng đọc từ database mỗi lần khi trả về dạng NDJSON streaming
+STREAM_YIELD_PER = int(os.getenv("STREAM_YIELD_PER", "1000"))
+# Gom các dòng NDJSON thành khối khoảng kích thước này (byte) trước khi gửi
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", str(64 * 1024)))
+
+# Timeline cảm xúc gom theo khoảng thời gian (GET /videos/{id}/timeline)
+# Độ dài mặc định của mỗi khoảng (giây)
+TIMELINE_DEFAULT_BUCKET = float(os.getenv("TIMELINE_DEFAULT_BUCKET", "1"))
+# Số khoảng tối đa của một response
+TIMELINE_MAX_POINTS = int(os.getenv("TIMELINE_MAX_POINTS", "5000"))
+TIMELINE_CACHE_SIZE = int(os.getenv("TIMELINE_CACHE_SIZE", "256"))
+
+# Cache người dùng đã xác thực (user_id -> thông tin cơ bản), tránh query
+# bảng users ở mỗi request
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+# Số luồng riêng cho bcrypt (mã hóa/xác minh mật khẩu)
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2))
+)
+
+# Nhận diện cảm xúc thời gian thực qua WebSocket (/live/ws)
+# Số lần suy luận tối đa mỗi giây của một kết nối
+LIVE_MAX_FPS = float(os.getenv("LIVE_MAX_FPS", "5"))
+# Số khung hình tối đa client được gửi mỗi giây, phần vượt bị bỏ qua
+LIVE_MAX_MESSAGES_PER_SECOND = int(os.getenv("LIVE_MAX_MESSAGES_PER_SECOND", "30"))
+# Dung lượng tối đa của một khung hình JPEG/WebP (byte)
+LIVE_MAX_FRAME_BYTES = int(os.getenv("LIVE_MAX_FRAME_BYTES", str(2 * 1024**2)))
+# Số luồng giải mã và nhận diện khuôn mặt dùng chung cho mọi kết nối; khi tắt
+# INFERENCE_SCHEDULER chỉ dùng 1 luồng vì context TensorRT không an toàn khi
+# nhiều luồng dùng chung
+LIVE_INFERENCE_WORKERS = int(os.getenv("LIVE_INFERENCE_WORKERS", "4"))
+# Chu kỳ (giây) gửi thống kê độ trễ p50/p99 cho client
+LIVE_STATS_INTERVAL = float(os.getenv("LIVE_STATS_INTERVAL", "5"))
+
+# Bộ lập lịch suy luận gom khuôn mặt của mọi luồng trực tiếp và video tải lên
+# thành lô, một luồng duy nhất gọi model
+INFERENCE_SCHEDULER = os.getenv("INFERENCE_SCHEDULER", "true").lower() == "true"
+# Số khuôn mặt tối đa của một lô (0 = max_batch_size của backend)
+SCHEDULER_MAX_BATCH_SIZE = int(os.getenv("SCHEDULER_MAX_BATCH_SIZE", "0"))
+# Thời gian chờ tối đa (ms) để gom thêm khuôn mặt trước khi chạy lô, theo loại
+# yêu cầu: live (camera) và upload (xử lý video)
+SCHEDULER_LIVE_MAX_WAIT_MS = float(os.getenv("SCHEDULER_LIVE_MAX_WAIT_MS", "5"))
+SCHEDULER_UPLOAD_MAX_WAIT_MS = float(os.getenv("SCHEDULER_UPLOAD_MAX_WAIT_MS", "20"))
+# Tỉ lệ chỗ trong lô dành cho video tải lên khi có luồng trực tiếp đang chờ;
+# phần còn lại ưu tiên cho live nên một video lớn không làm live phải chờ
+SCHEDULER_UPLOAD_SHARE = float(os.getenv("SCHEDULER_UPLOAD_SHARE", "0.25"))
+
+# Dùng lại kết quả nhận diện khi khuôn mặt gần như không đổi giữa hai lần lấy
+# mẫu (người học ngồi yên), bỏ qua lần suy luận
+CROP_REUSE = os.getenv("CROP_REUSE", "false").lower() == "true"
+# Độ khác nhau tối đa (0-1) giữa ảnh thu nhỏ của khuôn mặt hiện tại và khuôn
+# mặt đã suy luận gần nhất để dùng lại kết quả; lớn hơn thì bỏ qua được nhiều
+# lần suy luận hơn nhưng dễ bỏ lỡ thay đổi nhỏ của biểu cảm
+CROP_REUSE_THRESHOLD = float(os.getenv("CROP_REUSE_THRESHOLD", "0.01"))
+# Số lần dùng lại liên tiếp tối đa trước khi bắt buộc suy luận lại
+CROP_REUSE_MAX_REUSE = int(os.getenv("CROP_REUSE_MAX_REUSE", "10"))
+
+# Bỏ qua xử lý khi video tải lên trùng nội dung (SHA-256) với video đã xử lý
+# bằng cùng model và tham số, dùng chung file và kết quả
+VIDEO_DEDUP = os.getenv("VIDEO_DEDUP", "true").lower() == "true"
+# Phiên bản model, tăng khi thay model để video trùng nội dung được xử lý lại
+MODEL_VERSION = os.getenv("MODEL_VERSION", "1")
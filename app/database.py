@@ -1,17 +1,51 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
 # from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from config import DATABASE_URL
+from config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+)
 import sys
 
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+
+def pool_options(url):
+    """Cấu hình connection pool, SQLite dùng pool mặc định của SQLAlchemy"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
 # Tạo kết nối cơ sở dữ liệu
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Kết nối bất đồng bộ cho các handler async, không chặn event loop
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL)
+)
+# Không expire sau commit để đọc thuộc tính mà không phải query lại (không có
+# lazy load ngầm trong async)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -22,3 +56,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Hàm để lấy session bất đồng bộ, dùng trong các handler async def
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
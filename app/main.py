@@ -1,4 +1,5 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import sys
@@ -7,13 +8,17 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 
 from app.database import engine, Base, SessionLocal
-from app.routers import auth, videos, reports
-from app.config import UPLOAD_FOLDER
+from app.routers import auth, videos, reports, live
+from app.config import UPLOAD_FOLDER, MAX_UPLOAD_SIZE
+from app.migrations import run_migrations
 
 
 # Khởi tạo các bảng trong cơ sở dữ liệu
 Base.metadata.create_all(bind=engine)
 
+# Cập nhật schema của database cũ (thêm cột, index mới)
+run_migrations(engine)
+
 # Tạo thư mục uploads nếu chưa tồn tại
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -33,6 +38,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# Từ chối video quá lớn dựa vào Content-Length trước khi đọc body
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    if request.method == "POST" and request.url.path.endswith("/videos/upload"):
+        content_length = request.headers.get("content-length")
+        if content_length:
+            try:
+                content_length = int(content_length)
+            except ValueError:
+                content_length = -1
+            if content_length < 0:
+                return JSONResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    content={"detail": "Content-Length không hợp lệ"},
+                )
+            # Cho phép thêm 1 MB cho phần header của multipart
+            if content_length > MAX_UPLOAD_SIZE + 1024**2:
+                return JSONResponse(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    content={"detail": "Video vượt quá dung lượng cho phép"},
+                )
+    return await call_next(request)
+
+
 # Đăng ký static folder để phục vụ các file đã tải lên
 app.mount("/uploads", StaticFiles(directory=UPLOAD_FOLDER), name="uploads")
 
@@ -40,6 +70,7 @@ app.mount("/uploads", StaticFiles(directory=UPLOAD_FOLDER), name="uploads")
 # app.include_router(auth.router)
 # app.include_router(videos.router)
 # app.include_router(reports.router)
+# app.include_router(live.router)
 
 
 @app.get("/")
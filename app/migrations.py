@@ -0,0 +1,208 @@
+import sys
+import os
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import engine as default_engine
+from models.user import User
+from models.video import (
+    Video,
+    EmotionData,
+    SessionData,
+    EmotionReport,
+    ProcessedVideo,
+)
+from services.report_service import rebuild_reports
+
+# Các cột tổng tích lũy của EmotionReport (total_sessions, ... đã có từ trước)
+REPORT_COUNTER_COLUMNS = [
+    "happy_count",
+    "sad_count",
+    "angry_count",
+    "surprise_count",
+    "neutral_count",
+    "focus_score_sum",
+    "focus_score_count",
+    "engagement_score_sum",
+    "engagement_score_count",
+]
+
+# Bảng lưu các migration đã chạy
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+def add_column(table, *column_names):
+    """
+    Migration thêm các cột đã khai báo trong model vào bảng cũ (nếu chưa có)
+    """
+
+    def migrate(conn):
+        existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+        for column_name in column_names:
+            if column_name in existing:
+                continue
+
+            column = table.c[column_name]
+            definition = f"{column_name} {column.type.compile(dialect=conn.dialect)}"
+            if column.server_default is not None:
+                definition += f" DEFAULT {column.server_default.arg}"
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+
+    return migrate
+
+
+def create_table(table):
+    """
+    Migration tạo bảng mới đã khai báo trong model (nếu chưa có)
+    """
+
+    def migrate(conn):
+        table.create(bind=conn, checkfirst=True)
+
+    return migrate
+
+
+def rebuild_all_reports(conn):
+    """
+    Migration tính lại mọi báo cáo để điền các cột tổng tích lũy mới
+    """
+    db = Session(bind=conn)
+    try:
+        rebuild_reports(db)
+        db.flush()
+    finally:
+        db.close()
+
+
+def create_indexes(*tables):
+    """
+    Migration tạo các index đã khai báo trong model (bỏ qua index đã có)
+    """
+
+    def migrate(conn):
+        for table in tables:
+            existing = {
+                index["name"] for index in inspect(conn).get_indexes(table.name)
+            }
+            for index in table.indexes:
+                # Index duy nhất cần dọn dữ liệu trùng trước, có migration riêng
+                if index.unique:
+                    continue
+                if index.name not in existing:
+                    index.create(bind=conn)
+
+    return migrate
+
+
+def unique_daily_reports(conn):
+    """
+    Migration xóa báo cáo trùng ngày (do các lần cộng phiên đồng thời), thêm
+    unique index (user_id, report_date) rồi tính lại các báo cáo
+    """
+    table = EmotionReport.__table__
+    index_name = "uq_emotion_reports_user_id_report_date"
+    old_index_name = "ix_emotion_reports_user_id_report_date"
+
+    # Giữ báo cáo tạo sớm nhất của mỗi ngày, tổng được tính lại ở dưới
+    duplicates = conn.execute(
+        text(
+            f"DELETE FROM {table.name} WHERE id NOT IN ("
+            f"SELECT id FROM (SELECT MIN(id) AS id FROM {table.name} "
+            "GROUP BY user_id, report_date) AS kept)"
+        )
+    ).rowcount
+
+    existing = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+    if index_name not in existing:
+        for index in table.indexes:
+            if index.name == index_name:
+                index.create(bind=conn)
+    if old_index_name in existing:
+        if conn.dialect.name == "mysql":
+            conn.execute(text(f"DROP INDEX {old_index_name} ON {table.name}"))
+        else:
+            conn.execute(text(f"DROP INDEX {old_index_name}"))
+
+    if duplicates:
+        rebuild_all_reports(conn)
+
+
+# Danh sách migration theo thứ tự, tên đã chạy không được đổi
+MIGRATIONS = [
+    ("0001_video_timeline_path", add_column(Video.__table__, "timeline_path")),
+    (
+        "0002_hot_path_indexes",
+        create_indexes(
+            Video.__table__,
+            EmotionData.__table__,
+            SessionData.__table__,
+            EmotionReport.__table__,
+        ),
+    ),
+    ("0003_video_analysis", add_column(Video.__table__, "analysis")),
+    (
+        "0004_emotion_report_running_totals",
+        add_column(EmotionReport.__table__, *REPORT_COUNTER_COLUMNS),
+    ),
+    ("0005_rebuild_emotion_reports", rebuild_all_reports),
+    ("0006_processed_videos", create_table(ProcessedVideo.__table__)),
+    (
+        "0007_video_content_hash",
+        add_column(Video.__table__, "content_hash", "processed_video_id"),
+    ),
+    ("0008_unique_daily_reports", unique_daily_reports),
+]
+
+
+def run_migrations(engine=default_engine):
+    """
+    Chạy các migration chưa được áp dụng cho database
+
+    Mỗi migration tự kiểm tra schema hiện tại nên chạy được cả trên database
+    mới tạo bằng Base.metadata.create_all lẫn database cũ.
+
+    Returns:
+        List tên các migration vừa chạy
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+                "name VARCHAR(100) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+            )
+        )
+        applied = {
+            row[0] for row in conn.execute(text(f"SELECT name FROM {MIGRATIONS_TABLE}"))
+        }
+
+    newly_applied = []
+    for name, migrate in MIGRATIONS:
+        if name in applied:
+            continue
+
+        # Mỗi migration chạy trong transaction riêng
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text(
+                    f"INSERT INTO {MIGRATIONS_TABLE} (name, applied_at) "
+                    "VALUES (:name, :applied_at)"
+                ),
+                {"name": name, "applied_at": datetime.now()},
+            )
+        newly_applied.append(name)
+
+    return newly_applied
+
+
+if __name__ == "__main__":
+    try:
+        print("Running migrations...")
+        applied = run_migrations()
+        print("Applied:", applied or "nothing to do")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
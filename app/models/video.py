@@ -1,10 +1,33 @@
-from sqlalchemy import Column, Integer, String, Float, TIMESTAMP, ForeignKey, func
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Text,
+    Float,
+    TIMESTAMP,
+    ForeignKey,
+    Index,
+    UniqueConstraint,
+    func,
+)
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from database import Base
 
+# Cột thời gian dùng làm khóa phân trang: trên SQLite lưu không có micro giây
+# giống CURRENT_TIMESTAMP (và TIMESTAMP của MySQL) để giá trị cursor so sánh
+# bằng được với giá trị mặc định do server tạo
+KeysetTimestamp = TIMESTAMP().with_variant(
+    sqlite.DATETIME(truncate_microseconds=True), "sqlite"
+)
+
 
 class Video(Base):
     __tablename__ = "videos"
+    __table_args__ = (
+        # Danh sách video của người dùng
+        Index("ix_videos_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(
@@ -13,17 +36,62 @@ class Video(Base):
     filename = Column(String(255), nullable=False)
     filepath = Column(String(255), nullable=False)
     duration = Column(Float, default=0)
-    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+    # Thư mục timeline cảm xúc dạng cột (xem services/emotion_timeline.py)
+    timeline_path = Column(String(255), nullable=True)
+    # Kết quả phân tích cảm xúc (JSON dạng string), tính một lần khi xử lý xong
+    analysis = Column(Text, nullable=True)
+    # SHA-256 của nội dung file tải lên
+    content_hash = Column(String(64), nullable=True)
+    # Kết quả xử lý dùng chung với các video có cùng nội dung
+    processed_video_id = Column(
+        Integer, ForeignKey("processed_videos.id"), nullable=True
+    )
+    created_at = Column(KeysetTimestamp, server_default=func.current_timestamp())
 
     # Mối quan hệ
     user = relationship("User", back_populates="videos")
     emotion_data = relationship(
         "EmotionData", back_populates="video", cascade="all, delete-orphan"
     )
+    processed_video = relationship("ProcessedVideo")
+
+
+class ProcessedVideo(Base):
+    """
+    Kết quả xử lý theo nội dung file: các video tải lên trùng nội dung (cùng
+    model và tham số xử lý) dùng chung file video và timeline trên đĩa
+    """
+
+    __tablename__ = "processed_videos"
+    __table_args__ = (
+        UniqueConstraint(
+            "content_hash",
+            "processing_key",
+            name="uq_processed_videos_content_hash_processing_key",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)
+    # Khóa của phiên bản model và tham số lấy mẫu (xem processing_key)
+    processing_key = Column(String(64), nullable=False)
+    filepath = Column(String(255), nullable=False)
+    timeline_path = Column(String(255), nullable=True)
+    duration = Column(Float, default=0)
+    analysis = Column(Text, nullable=True)
+    # Số video đang dùng kết quả này, file chỉ bị xóa khi về 0
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
 
 
 class EmotionData(Base):
     __tablename__ = "emotion_data"
+    __table_args__ = (
+        # Dữ liệu cảm xúc của một video theo thứ tự thời gian
+        Index("ix_emotion_data_video_id_timestamp", "video_id", "timestamp"),
+        # Thống kê GROUP BY emotion chỉ cần đọc index
+        Index("ix_emotion_data_video_id_emotion", "video_id", "emotion"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     video_id = Column(
@@ -41,13 +109,17 @@ class EmotionData(Base):
 
 class SessionData(Base):
     __tablename__ = "session_data"
+    __table_args__ = (
+        # Phiên học tập của người dùng theo khoảng thời gian
+        Index("ix_session_data_user_id_start_time", "user_id", "start_time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
     session_name = Column(String(255))
-    start_time = Column(TIMESTAMP, server_default=func.current_timestamp())
+    start_time = Column(KeysetTimestamp, server_default=func.current_timestamp())
     end_time = Column(TIMESTAMP, nullable=True)
     duration_minutes = Column(Integer, default=0)
     dominant_emotion = Column(String(20))
@@ -61,6 +133,16 @@ class SessionData(Base):
 
 class EmotionReport(Base):
     __tablename__ = "emotion_reports"
+    __table_args__ = (
+        # Mỗi người dùng một báo cáo mỗi ngày, index này cũng dùng để tra báo
+        # cáo theo ngày
+        Index(
+            "uq_emotion_reports_user_id_report_date",
+            "user_id",
+            "report_date",
+            unique=True,
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(
@@ -77,5 +159,16 @@ class EmotionReport(Base):
     focused_percentage = Column(Float, default=0)
     average_engagement = Column(Float, default=0)
 
+    # Tổng tích lũy để cộng dồn từng phiên vào báo cáo (xem services/report_service.py)
+    happy_count = Column(Integer, default=0, server_default="0")
+    sad_count = Column(Integer, default=0, server_default="0")
+    angry_count = Column(Integer, default=0, server_default="0")
+    surprise_count = Column(Integer, default=0, server_default="0")
+    neutral_count = Column(Integer, default=0, server_default="0")
+    focus_score_sum = Column(Float, default=0, server_default="0")
+    focus_score_count = Column(Integer, default=0, server_default="0")
+    engagement_score_sum = Column(Float, default=0, server_default="0")
+    engagement_score_count = Column(Integer, default=0, server_default="0")
+
     # Mối quan hệ
     user = relationship("User", back_populates="reports")
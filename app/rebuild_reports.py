@@ -0,0 +1,61 @@
+import argparse
+import math
+import sys
+import os
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import SessionLocal
+
+# Nạp model User để relationship của Video/EmotionReport tìm được lớp này
+import models.user
+from services.report_service import rebuild_reports
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Tính lại báo cáo cảm xúc hàng ngày từ các phiên học tập "
+        "và so sánh với giá trị đã cộng dồn"
+    )
+    parser.add_argument("--start", type=date.fromisoformat, help="Ngày bắt đầu")
+    parser.add_argument("--end", type=date.fromisoformat, help="Ngày kết thúc")
+    parser.add_argument("--user-id", type=int, help="Chỉ tính cho một người dùng")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Chỉ kiểm tra, không ghi kết quả tính lại vào database",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    db = SessionLocal()
+    try:
+        print("Rebuilding reports...")
+        mismatches = rebuild_reports(db, args.start, args.end, args.user_id)
+
+        for user_id, day, previous, current in mismatches:
+            changed = {
+                column: (previous[column], current[column])
+                for column in current
+                if not math.isclose(previous[column], current[column], abs_tol=1e-6)
+            }
+            print(f"Mismatch: user {user_id}, {day}: {changed}")
+
+        if args.check:
+            db.rollback()
+        else:
+            db.commit()
+        print(f"Results: {len(mismatches)} report(s) differ")
+
+        # Ở chế độ kiểm tra, báo lỗi nếu giá trị cộng dồn bị lệch
+        if args.check and mismatches:
+            sys.exit(1)
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
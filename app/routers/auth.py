@@ -1,17 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
 import json
 
-from ..database import get_db, SessionLocal
+from ..database import get_async_db
 from ..models.user import User
 from ..schemas.user import UserCreate, UserResponse, Token
 from ..utils.security import (
     authenticate_user,
     create_access_token,
-    get_password_hash,
+    get_password_hash_async,
     get_current_user,
+    invalidate_user,
+    UserPrincipal,
 )
 from ..services.system_info import SystemInfoService
 from ..config import ACCESS_TOKEN_EXPIRE_MINUTES
@@ -20,16 +24,19 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 
 
 @router.post("/register", response_model=UserResponse)
-def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register_user(
+    user_data: UserCreate, db: AsyncSession = Depends(get_async_db)
+):
     """
     Đăng ký người dùng mới và thu thập thông tin hệ thống
     """
     # Kiểm tra người dùng đã tồn tại
-    existing_user = (
-        db.query(User)
-        .filter((User.username == user_data.username) | (User.email == user_data.email))
-        .first()
+    result = await db.execute(
+        select(User).where(
+            (User.username == user_data.username) | (User.email == user_data.email)
+        )
     )
+    existing_user = result.scalars().first()
 
     if existing_user:
         raise HTTPException(
@@ -37,11 +44,10 @@ def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
             detail="Tên người dùng hoặc email đã tồn tại",
         )
 
-    # Thu thập thông tin hệ thống
-    system_info = SystemInfoService.get_system_info()
-
-    # Mã hóa mật khẩu
-    hashed_password = get_password_hash(user_data.password)
+    # Thu thập thông tin hệ thống và mã hóa mật khẩu (chặn/tốn CPU nên chạy
+    # trong threadpool)
+    system_info = await run_in_threadpool(SystemInfoService.get_system_info)
+    hashed_password = await get_password_hash_async(user_data.password)
 
     # Tạo người dùng mới
     db_user = User(
@@ -52,20 +58,21 @@ def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     )
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
 
     return db_user
 
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Đăng nhập và lấy token truy cập
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(
@@ -84,40 +91,51 @@ def login_for_access_token(
 
 
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
     Lấy thông tin người dùng hiện tại
     """
-    return current_user
+    # Cache chỉ giữ thông tin cơ bản, system_info đọc từ database
+    return await db.get(User, current_user.id)
 
 
 @router.get("/system-info")
-def get_system_info(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+async def get_system_info(
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Lấy thông tin hệ thống của người dùng hiện tại
     """
-    if not current_user.system_info:
+    user = await db.get(User, current_user.id)
+
+    if not user.system_info:
         # Nếu chưa có thông tin hệ thống, thu thập mới
-        system_info = SystemInfoService.get_system_info()
-        current_user.system_info = json.dumps(system_info)
-        db.commit()
+        system_info = await run_in_threadpool(SystemInfoService.get_system_info)
+        user.system_info = json.dumps(system_info)
+        await db.commit()
+        invalidate_user(user.id)
         return system_info
 
     # Nếu đã có thông tin, chuyển đổi từ JSON sang dict
-    return json.loads(current_user.system_info)
+    return json.loads(user.system_info)
 
 
 @router.put("/update-system-info")
-def update_system_info(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+async def update_system_info(
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Cập nhật thông tin hệ thống của người dùng hiện tại
     """
-    system_info = SystemInfoService.get_system_info()
-    current_user.system_info = json.dumps(system_info)
-    db.commit()
+    system_info = await run_in_threadpool(SystemInfoService.get_system_info)
+    user = await db.get(User, current_user.id)
+    user.system_info = json.dumps(system_info)
+    await db.commit()
+    invalidate_user(user.id)
 
     return system_info
@@ -0,0 +1,240 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, status
+
+from ..database import AsyncSessionLocal
+from ..services.emotion_detector import EmotionDetector
+from ..services.inference_scheduler import LIVE, get_scheduler
+from ..services.crop_reuse import CropReuse
+from ..utils.metrics import LatencyRecorder
+from ..utils.security import get_current_user, get_user_from_token, UserPrincipal
+from ..config import (
+    LIVE_MAX_FPS,
+    LIVE_MAX_MESSAGES_PER_SECOND,
+    LIVE_MAX_FRAME_BYTES,
+    LIVE_INFERENCE_WORKERS,
+    LIVE_STATS_INTERVAL,
+    INFERENCE_SCHEDULER,
+    CROP_REUSE,
+)
+
+router = APIRouter(prefix="/live", tags=["live"])
+
+# Luồng giải mã và nhận diện riêng, không chiếm threadpool của các handler
+# đồng bộ. Khi có scheduler, model chỉ được gọi từ luồng của scheduler nên
+# nhiều kết nối chạy song song và được gom chung lô
+inference_executor = ThreadPoolExecutor(
+    max_workers=LIVE_INFERENCE_WORKERS if INFERENCE_SCHEDULER else 1,
+    thread_name_prefix="live-inference",
+)
+
+# Độ trễ xử lý (giải mã + suy luận) của mọi kết nối
+latency_recorder = LatencyRecorder()
+live_counters = {"connections": 0, "received": 0, "inferred": 0, "dropped": 0}
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector():
+    """Khởi tạo EmotionDetector ở lần dùng đầu tiên, dùng chung cho mọi kết nối"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = EmotionDetector(scheduler=get_scheduler())
+    return _detector
+
+
+def infer_frame(data, reuse=None):
+    """
+    Giải mã ảnh JPEG/WebP và nhận diện cảm xúc
+
+    Args:
+        reuse: CropReuse của kết nối, dùng lại kết quả khi khuôn mặt không đổi
+
+    Returns:
+        List kết quả cho từng khuôn mặt, None nếu không giải mã được ảnh
+    """
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return None
+    return get_detector().detect_emotion(frame, LIVE, reuse)
+
+
+class LiveStream:
+    """
+    Trạng thái của một kết nối: chỉ giữ khung hình mới nhất, khung hình cũ
+    chưa kịp suy luận bị thay thế (và đếm là dropped)
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.frame = None
+        self.frame_seq = 0
+        self.received_at = 0.0
+        self.frame_ready = asyncio.Event()
+        self.received = 0
+        self.dropped = 0
+        self.throttled = 0
+        self.latency = LatencyRecorder()
+        self.reuse = CropReuse() if CROP_REUSE else None
+
+    async def receive_frames(self):
+        """Nhận khung hình từ client cho tới khi ngắt kết nối"""
+        window_start = time.monotonic()
+        window_count = 0
+
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+            data = message.get("bytes")
+            if data is None:
+                continue
+            if len(data) > LIVE_MAX_FRAME_BYTES:
+                await self.websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                return
+
+            # Giới hạn số khung hình nhận mỗi giây
+            now = time.monotonic()
+            if now - window_start >= 1.0:
+                window_start, window_count = now, 0
+            window_count += 1
+            if window_count > LIVE_MAX_MESSAGES_PER_SECOND:
+                self.throttled += 1
+                continue
+
+            self.received += 1
+            live_counters["received"] += 1
+            if self.frame is not None:
+                self.dropped += 1
+                live_counters["dropped"] += 1
+
+            self.frame = data
+            self.frame_seq += 1
+            self.received_at = now
+            self.frame_ready.set()
+
+    async def run_inference(self):
+        """Suy luận khung hình mới nhất, tối đa LIVE_MAX_FPS lần mỗi giây"""
+        loop = asyncio.get_running_loop()
+        min_interval = 1.0 / LIVE_MAX_FPS
+        last_start = 0.0
+        last_stats = time.monotonic()
+
+        while True:
+            await self.frame_ready.wait()
+
+            # Chờ đủ khoảng cách tối thiểu; khung hình tới trong lúc chờ sẽ
+            # thay khung hình hiện tại
+            wait = last_start + min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            self.frame_ready.clear()
+            data, seq, received_at = self.frame, self.frame_seq, self.received_at
+            self.frame = None
+
+            last_start = time.monotonic()
+            faces = await loop.run_in_executor(
+                inference_executor, infer_frame, data, self.reuse
+            )
+            finished = time.monotonic()
+            latency_ms = (finished - last_start) * 1000
+
+            if faces is None:
+                await self.websocket.send_json(
+                    {"type": "error", "frame": seq, "detail": "Không giải mã được ảnh"}
+                )
+                continue
+
+            self.latency.record(latency_ms)
+            latency_recorder.record(latency_ms)
+            live_counters["inferred"] += 1
+
+            await self.websocket.send_json(
+                {
+                    "type": "result",
+                    "frame": seq,
+                    "faces": faces,
+                    "latency_ms": round(latency_ms, 2),
+                    "queue_ms": round((last_start - received_at) * 1000, 2),
+                    "dropped": self.dropped,
+                }
+            )
+
+            if finished - last_stats >= LIVE_STATS_INTERVAL:
+                last_stats = finished
+                await self.websocket.send_json({"type": "stats", **self.stats()})
+
+    def stats(self):
+        stats = {
+            "received": self.received,
+            "dropped": self.dropped,
+            "throttled": self.throttled,
+            "latency_ms": self.latency.summary(),
+        }
+        if self.reuse is not None:
+            stats["inferences_saved"] = self.reuse.reused
+        return stats
+
+
+@router.websocket("/ws")
+async def live_inference(websocket: WebSocket, token: str = Query(None)):
+    """
+    Nhận diện cảm xúc thời gian thực
+
+    Client gửi từng khung hình JPEG/WebP dạng binary message, server trả về
+    JSON {"type": "result", "frame", "faces", "latency_ms", ...} cho mỗi khung
+    hình được suy luận và định kỳ {"type": "stats", ...}. Token truy cập truyền
+    qua query string vì trình duyệt không gửi được header Authorization.
+    """
+    principal = None
+    if token:
+        async with AsyncSessionLocal() as db:
+            principal = await get_user_from_token(token, db)
+    if principal is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    stream = LiveStream(websocket)
+    live_counters["connections"] += 1
+
+    receiver = asyncio.create_task(stream.receive_frames())
+    inference = asyncio.create_task(stream.run_inference())
+    try:
+        # Kết thúc khi client ngắt kết nối (receiver xong) hoặc gửi lỗi
+        done, pending = await asyncio.wait(
+            {receiver, inference}, return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            try:
+                task.result()
+            except WebSocketDisconnect:
+                pass
+    finally:
+        live_counters["connections"] -= 1
+
+
+@router.get("/stats")
+async def get_live_stats(current_user: UserPrincipal = Depends(get_current_user)):
+    """
+    Thống kê nhận diện thời gian thực của mọi kết nối (độ trễ p50/p99 tính
+    trên các lần suy luận gần nhất) và của bộ lập lịch suy luận
+    """
+    stats = {**live_counters, "latency_ms": latency_recorder.summary()}
+    scheduler = get_scheduler()
+    if scheduler is not None:
+        stats["scheduler"] = scheduler.stats()
+    return stats
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import date, datetime, timedelta
 
 from ..database import get_db, SessionLocal
@@ -8,6 +8,9 @@ from ..models.user import User
 from ..models.video import SessionData, EmotionReport
 from ..schemas.video import EmotionReportResponse
 from ..utils.security import get_current_user
+from ..services.report_service import fold_session, rebuild_report
+from ..utils.pagination import NEXT_CURSOR_HEADER, paginate, keyset_query, stream_query
+from ..config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter(
     prefix="/reports",
@@ -77,6 +80,9 @@ def end_session(
     duration = (session.end_time - session.start_time).total_seconds() / 60
     session.duration_minutes = round(duration)
     
+    # Cộng phiên vào báo cáo của ngày, cùng transaction với việc kết thúc phiên
+    fold_session(db, session)
+    
     db.commit()
     db.refresh(session)
     
@@ -87,41 +93,61 @@ def end_session(
     }
 
 
+def session_to_dict(session: SessionData):
+    return {
+        "id": session.id,
+        "session_name": session.session_name,
+        "start_time": session.start_time,
+        "end_time": session.end_time,
+        "duration_minutes": session.duration_minutes,
+        "dominant_emotion": session.dominant_emotion,
+        "focus_score": session.focus_score,
+        "engagement_score": session.engagement_score
+    }
+
+
 @router.get("/sessions", response_model=List[dict])
 def get_user_sessions(
+    response: Response,
     start_date: date = None,
     end_date: date = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Lấy danh sách phiên học tập của người dùng theo khoảng thời gian
-    """
-    query = db.query(SessionData).filter(SessionData.user_id == current_user.id)
+    Lấy danh sách phiên học tập của người dùng theo khoảng thời gian, mới nhất trước
     
-    if start_date:
-        query = query.filter(SessionData.start_time >= datetime.combine(start_date, datetime.min.time()))
+    Trả về từng trang limit phiên, cursor của trang sau nằm trong header
+    X-Next-Cursor. format=ndjson trả về toàn bộ danh sách (từ cursor) dạng
+    NDJSON streaming.
+    """
+    def build_query(session_db):
+        query = session_db.query(SessionData).filter(SessionData.user_id == current_user.id)
+        
+        if start_date:
+            query = query.filter(SessionData.start_time >= datetime.combine(start_date, datetime.min.time()))
+        
+        if end_date:
+            query = query.filter(SessionData.start_time <= datetime.combine(end_date, datetime.max.time()))
+        
+        return query
     
-    if end_date:
-        query = query.filter(SessionData.start_time <= datetime.combine(end_date, datetime.max.time()))
+    columns = [SessionData.start_time, SessionData.id]
     
-    sessions = query.order_by(SessionData.start_time.desc()).all()
+    if format == "ndjson":
+        return stream_query(
+            lambda stream_db: keyset_query(build_query(stream_db), columns, cursor, descending=True),
+            session_to_dict
+        )
     
-    result = []
-    for session in sessions:
-        session_dict = {
-            "id": session.id,
-            "session_name": session.session_name,
-            "start_time": session.start_time,
-            "end_time": session.end_time,
-            "duration_minutes": session.duration_minutes,
-            "dominant_emotion": session.dominant_emotion,
-            "focus_score": session.focus_score,
-            "engagement_score": session.engagement_score
-        }
-        result.append(session_dict)
+    sessions, next_cursor = paginate(build_query(db), columns, cursor, limit, descending=True)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
-    return result
+    return [session_to_dict(session) for session in sessions]
 
 
 @router.get("/daily", response_model=List[EmotionReportResponse])
@@ -164,97 +190,17 @@ def generate_daily_report(
     if not report_date:
         report_date = date.today()
     
-    # Kiểm tra xem báo cáo đã tồn tại chưa
-    existing_report = db.query(EmotionReport).filter(
-        EmotionReport.user_id == current_user.id,
-        EmotionReport.report_date == report_date
-    ).first()
-    
-    # Lấy tất cả các phiên học tập trong ngày
-    start_datetime = datetime.combine(report_date, datetime.min.time())
-    end_datetime = datetime.combine(report_date, datetime.max.time())
-    
-    sessions = db.query(SessionData).filter(
-        SessionData.user_id == current_user.id,
-        SessionData.start_time >= start_datetime,
-        SessionData.start_time <= end_datetime,
-        SessionData.end_time.isnot(None)  # Chỉ lấy các phiên đã kết thúc
-    ).all()
-    
-    if not sessions:
-        if existing_report:
-            return {"message": "Báo cáo đã tồn tại và không có phiên học tập mới"}
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Không có phiên học tập nào trong ngày này"
-            )
-    
-    # Tính toán các chỉ số báo cáo
-    total_sessions = len(sessions)
-    total_duration = sum(session.duration_minutes for session in sessions)
-    
-    # Tính phần trăm các cảm xúc
-    emotion_counts = {"happy": 0, "sad": 0, "angry": 0, "surprise": 0, "neutral": 0}
-    focus_scores = []
-    engagement_scores = []
-    
-    for session in sessions:
-        # Đếm cảm xúc
-        if session.dominant_emotion and session.dominant_emotion in emotion_counts:
-            emotion_counts[session.dominant_emotion] += 1
-        
-        # Thêm điểm tập trung và tương tác
-        if session.focus_score is not None:
-            focus_scores.append(session.focus_score)
-        if session.engagement_score is not None:
-            engagement_scores.append(session.engagement_score)
-    
-    # Tính phần trăm các cảm xúc
-    happy_percentage = (emotion_counts["happy"] / total_sessions) * 100 if total_sessions > 0 else 0
-    sad_percentage = (emotion_counts["sad"] / total_sessions) * 100 if total_sessions > 0 else 0
-    angry_percentage = (emotion_counts["angry"] / total_sessions) * 100 if total_sessions > 0 else 0
-    surprised_percentage = (emotion_counts["surprise"] / total_sessions) * 100 if total_sessions > 0 else 0
-    neutral_percentage = (emotion_counts["neutral"] / total_sessions) * 100 if total_sessions > 0 else 0
+    # Báo cáo được cộng dồn khi kết thúc từng phiên, ở đây tính lại từ đầu
+    report, _ = rebuild_report(db, current_user.id, report_date)
     
-    # Tính điểm tập trung và tương tác trung bình
-    focused_percentage = sum(focus_scores) / len(focus_scores) if focus_scores else 0
-    average_engagement = sum(engagement_scores) / len(engagement_scores) if engagement_scores else 0
-    
-    # Tạo hoặc cập nhật báo cáo
-    if existing_report:
-        existing_report.total_sessions = total_sessions
-        existing_report.total_duration_minutes = total_duration
-        existing_report.happy_percentage = happy_percentage
-        existing_report.sad_percentage = sad_percentage
-        existing_report.angry_percentage = angry_percentage
-        existing_report.surprised_percentage = surprised_percentage
-        existing_report.neutral_percentage = neutral_percentage
-        existing_report.focused_percentage = focused_percentage
-        existing_report.average_engagement = average_engagement
-        
-        db.commit()
-        db.refresh(existing_report)
-        report = existing_report
-    else:
-        new_report = EmotionReport(
-            user_id=current_user.id,
-            report_date=report_date,
-            total_sessions=total_sessions,
-            total_duration_minutes=total_duration,
-            happy_percentage=happy_percentage,
-            sad_percentage=sad_percentage,
-            angry_percentage=angry_percentage,
-            surprised_percentage=surprised_percentage,
-            neutral_percentage=neutral_percentage,
-            focused_percentage=focused_percentage,
-            average_engagement=average_engagement
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Không có phiên học tập nào trong ngày này"
         )
-        
-        db.add(new_report)
-        db.commit()
-        db.refresh(new_report)
-        report = new_report
+    
+    db.commit()
+    db.refresh(report)
     
     return {
         "id": report.id,
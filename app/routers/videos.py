@@ -1,29 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    UploadFile,
+    File,
+    Query,
+    Response,
+    status,
+)
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import sys
 
 sys.path.append("C:/Users/ha161/CodeTest/TTTTN/app")
-from database import get_db
+from database import get_db, get_async_db
 from models.user import User
 from models.video import Video, EmotionData
-from schemas.video import VideoResponse, EmotionDataResponse, VideoAnalysisResponse
+from schemas.video import (
+    VideoResponse,
+    VideoJobResponse,
+    EmotionDataResponse,
+    VideoAnalysisResponse,
+    VideoTimelineResponse,
+)
 from utils.security import get_current_user
+from utils.pagination import (
+    NEXT_CURSOR_HEADER,
+    paginate_async,
+    keyset_query,
+    stream_query,
+)
+from config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, TIMELINE_MAX_POINTS
 from services.video_service import VideoService
 
 router = APIRouter(prefix="/videos", tags=["videos"])
 
+# Handler chỉ đọc ít dòng dùng async def với AsyncSession; handler nặng (đọc
+# nhiều dòng, tính bằng NumPy, xóa file) dùng def với Session đồng bộ để
+# FastAPI chạy trong threadpool, không chặn event loop
+
 video_service = VideoService()
 
 
-@router.post("/upload", response_model=VideoResponse)
+@router.post(
+    "/upload", response_model=VideoJobResponse, status_code=status.HTTP_202_ACCEPTED
+)
 async def upload_video(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
-    Tải lên video và xử lý nhận diện cảm xúc
+    Tải lên video, việc nhận diện cảm xúc chạy nền
+
+    Theo dõi tiến độ qua GET /videos/jobs/{job_id}
     """
     # Kiểm tra định dạng file
     if not file.filename.lower().endswith((".mp4", ".avi", ".mov", ".mkv")):
@@ -32,37 +63,82 @@ async def upload_video(
             detail="Chỉ hỗ trợ các định dạng video: MP4, AVI, MOV, MKV",
         )
 
-    # Lưu video và xử lý nhận diện cảm xúc
-    video = await video_service.save_video(file, current_user.id, db)
+    # Lưu video và đưa vào hàng đợi xử lý
+    job = await video_service.enqueue_video(file, current_user.id)
 
-    return video
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=VideoJobResponse)
+def get_video_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Lấy trạng thái và tiến độ xử lý video
+    """
+    job = video_service.get_job(job_id, current_user.id)
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Công việc không tồn tại hoặc không thuộc về người dùng này",
+        )
+
+    return job
 
 
 @router.get("/", response_model=List[VideoResponse])
-def get_user_videos(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+async def get_user_videos(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Lấy danh sách video của người dùng
+    Lấy danh sách video của người dùng theo thứ tự tải lên
+
+    Trả về từng trang limit video, cursor của trang sau nằm trong header
+    X-Next-Cursor. format=ndjson trả về toàn bộ danh sách (từ cursor) dạng
+    NDJSON streaming.
     """
-    videos = db.query(Video).filter(Video.user_id == current_user.id).all()
+    columns = [Video.created_at, Video.id]
+
+    if format == "ndjson":
+        return stream_query(
+            lambda stream_db: keyset_query(
+                stream_db.query(Video).filter(Video.user_id == current_user.id),
+                columns,
+                cursor,
+            ),
+            lambda video: VideoResponse.model_validate(video).model_dump(),
+        )
+
+    videos, next_cursor = await paginate_async(
+        db,
+        select(Video).where(Video.user_id == current_user.id),
+        columns,
+        cursor,
+        limit,
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
     return videos
 
 
 @router.get("/{video_id}", response_model=VideoResponse)
-def get_video(
+async def get_video(
     video_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Lấy thông tin chi tiết về video
     """
-    video = (
-        db.query(Video)
-        .filter(Video.id == video_id, Video.user_id == current_user.id)
-        .first()
+    result = await db.execute(
+        select(Video).where(Video.id == video_id, Video.user_id == current_user.id)
     )
+    video = result.scalars().first()
 
     if not video:
         raise HTTPException(
@@ -76,11 +152,17 @@ def get_video(
 @router.get("/{video_id}/emotions", response_model=List[EmotionDataResponse])
 def get_video_emotions(
     video_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """
-    Lấy dữ liệu cảm xúc từ video
+    Lấy dữ liệu cảm xúc từ video theo thứ tự thời gian
+
+    Phân trang và format=ndjson giống GET /videos/
     """
     # Kiểm tra xem video có tồn tại và thuộc về người dùng hiện tại không
     video = (
@@ -95,12 +177,44 @@ def get_video_emotions(
             detail="Video không tồn tại hoặc không thuộc về người dùng này",
         )
 
-    # Lấy dữ liệu cảm xúc
-    emotions = db.query(EmotionData).filter(EmotionData.video_id == video_id).all()
+    # Lấy dữ liệu cảm xúc (từ emotion_data hoặc timeline của video)
+    if format == "ndjson":
+        return video_service.stream_video_emotions(video, db, cursor)
+
+    emotions, next_cursor = video_service.get_video_emotions(video, db, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     return emotions
 
 
+@router.get("/{video_id}/timeline", response_model=VideoTimelineResponse)
+def get_video_timeline(
+    video_id: int,
+    bucket: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=1, le=TIMELINE_MAX_POINTS),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Timeline cảm xúc của video gom theo khoảng thời gian (vd: bucket=10s), dùng
+    để vẽ biểu đồ; max_points giới hạn số điểm (vd: theo số pixel của biểu đồ)
+    """
+    video = (
+        db.query(Video)
+        .filter(Video.id == video_id, Video.user_id == current_user.id)
+        .first()
+    )
+
+    if not video:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video không tồn tại hoặc không thuộc về người dùng này",
+        )
+
+    return video_service.get_emotion_timeline(video, db, bucket, max_points)
+
+
 @router.get("/{video_id}/analysis", response_model=VideoAnalysisResponse)
 def analyze_video(
     video_id: int,
@@ -127,3 +241,27 @@ def analyze_video(
     analysis = video_service.analyze_video_emotions(video_id, db)
 
     return analysis
+
+
+@router.delete("/{video_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_video(
+    video_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Xóa video và toàn bộ dữ liệu cảm xúc của video
+    """
+    video = (
+        db.query(Video)
+        .filter(Video.id == video_id, Video.user_id == current_user.id)
+        .first()
+    )
+
+    if not video:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video không tồn tại hoặc không thuộc về người dùng này",
+        )
+
+    video_service.delete_video(video, db)
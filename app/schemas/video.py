@@ -22,6 +22,16 @@ class VideoResponse(VideoBase):
         orm_mode = True
 
 
+class VideoJobResponse(BaseModel):
+    id: str
+    status: str
+    progress: float  # Phần trăm hoàn thành (0-100)
+    video_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
 class EmotionDataBase(BaseModel):
     timestamp: float
     emotion: str
@@ -50,6 +60,21 @@ class VideoAnalysisResponse(BaseModel):
     dominant_emotion: str
     focus_score: float
     engagement_score: float
+    # Số khuôn mặt dùng lại kết quả thay vì suy luận (chỉ có với video xử lý
+    # sau khi bật CROP_REUSE)
+    inferences_saved: Optional[int] = None
+
+
+class VideoTimelineResponse(BaseModel):
+    video_id: int
+    bucket_seconds: float
+    duration: float
+    labels: List[str]
+    # Các mảng dưới đây có một phần tử cho mỗi khoảng thời gian
+    bucket_start: List[float]
+    face_count: List[int]
+    mean_confidence: List[Optional[float]]  # None nếu khoảng không có khuôn mặt
+    distribution: Dict[str, List[float]]  # Tỉ lệ (0-1) của từng cảm xúc
 
 
 class EmotionReportCreate(BaseModel):
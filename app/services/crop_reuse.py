@@ -0,0 +1,142 @@
+import cv2
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from config import CROP_REUSE_THRESHOLD, CROP_REUSE_MAX_REUSE, TRACKING_IOU_THRESHOLD
+from services.face_tracker import box_iou
+
+# Kích thước ảnh thu nhỏ dùng làm chữ ký của khuôn mặt
+SIGNATURE_SIZE = 16
+
+
+def crop_signature(crop):
+    """
+    Chữ ký của khuôn mặt đã cắt: ảnh thu nhỏ SIGNATURE_SIZE x SIGNATURE_SIZE
+    trừ đi độ sáng trung bình, để thay đổi ánh sáng toàn ảnh không bị tính là
+    thay đổi biểu cảm
+    """
+    small = cv2.resize(
+        crop, (SIGNATURE_SIZE, SIGNATURE_SIZE), interpolation=cv2.INTER_AREA
+    ).astype(np.float32)
+    return small - small.mean()
+
+
+def signature_distance(a, b):
+    """Trung bình độ lệch tuyệt đối giữa hai chữ ký, thang 0-1"""
+    return float(np.abs(a - b).mean()) / 255.0
+
+
+class _Face:
+    def __init__(self, key, box, signature):
+        self.key = key
+        self.box = box
+        # Chữ ký của lần suy luận gần nhất (không phải lần dùng lại)
+        self.signature = signature
+        # Vị trí trong lô đang suy luận, hoặc mảng xác suất đã có
+        self.output = None
+        self.reuse_count = 0
+
+
+class CropReuse:
+    """
+    Dùng lại kết quả phân loại khi khuôn mặt gần như không đổi so với lần suy
+    luận gần nhất của cùng khuôn mặt
+
+    Khuôn mặt được ghép theo track_id khi có FaceTracker, nếu không thì theo
+    vị trí (IoU với khuôn mặt ở khung hình trước). Khuôn mặt hiện tại luôn
+    được so với lần suy luận gần nhất chứ không phải lần dùng lại gần nhất,
+    nên thay đổi chậm qua nhiều khung hình vẫn bị phát hiện. Trạng thái chỉ
+    dùng trong một video hoặc một luồng camera.
+    """
+
+    def __init__(
+        self,
+        threshold=CROP_REUSE_THRESHOLD,
+        max_reuse=CROP_REUSE_MAX_REUSE,
+        iou_threshold=TRACKING_IOU_THRESHOLD,
+    ):
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.iou_threshold = iou_threshold
+        self.faces = []
+        # Số khuôn mặt đã suy luận và đã dùng lại kết quả
+        self.inferred = 0
+        self.reused = 0
+
+    def _match(self, locations):
+        """Ghép từng vị trí khuôn mặt với khuôn mặt ở khung hình trước"""
+        matches = [None] * len(locations)
+        by_key = {face.key: face for face in self.faces if face.key is not None}
+
+        if by_key:
+            for i, location in enumerate(locations):
+                if len(location) > 4:
+                    matches[i] = by_key.get(location[4])
+            return matches
+
+        # Không có track_id: ghép tham lam theo IoU lớn nhất
+        candidates = []
+        for i, location in enumerate(locations):
+            for j, face in enumerate(self.faces):
+                iou = box_iou(face.box, location[:4])
+                if iou >= self.iou_threshold:
+                    candidates.append((iou, i, j))
+
+        used = set()
+        for _, i, j in sorted(candidates, reverse=True):
+            if matches[i] is None and j not in used:
+                matches[i] = self.faces[j]
+                used.add(j)
+        return matches
+
+    def assign(self, crops, locations, to_infer):
+        """
+        Quyết định khuôn mặt nào của một khung hình cần suy luận
+
+        Args:
+            crops: Mảng [N, height, width] của khung hình (xem crop_faces)
+            locations: Vị trí khuôn mặt tương ứng (x, y, w, h[, track_id])
+            to_infer: List các khuôn mặt cần suy luận của cả lô, được thêm vào
+
+        Returns:
+            List (nguồn kết quả, có dùng lại hay không) cho từng khuôn mặt;
+            nguồn là vị trí trong to_infer hoặc mảng xác suất đã có
+        """
+        matches = self._match(locations)
+        faces = []
+        assigned = []
+
+        for crop, location, face in zip(crops, locations, matches):
+            signature = crop_signature(crop)
+            key = location[4] if len(location) > 4 else None
+
+            if (
+                face is not None
+                and face.reuse_count < self.max_reuse
+                and signature_distance(signature, face.signature) <= self.threshold
+            ):
+                face.box = location[:4]
+                face.reuse_count += 1
+                self.reused += 1
+                assigned.append((face.output, True))
+            else:
+                face = _Face(key, location[:4], signature)
+                face.output = len(to_infer)
+                to_infer.append(crop)
+                self.inferred += 1
+                assigned.append((face.output, False))
+
+            faces.append(face)
+
+        # Khuôn mặt không còn xuất hiện thì bỏ
+        self.faces = faces
+        return assigned
+
+    def resolve(self, outputs):
+        """Gán kết quả của lô vừa suy luận cho các khuôn mặt đang chờ"""
+        for face in self.faces:
+            if isinstance(face.output, int):
+                face.output = np.array(outputs[face.output])
@@ -1,123 +1,422 @@
 import cv2
 import numpy as np
-import tensorrt as trt
-import pycuda.driver as cuda
-import pycuda.autoinit
+import functools
 import json
+import threading
 import time
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 
-from config import MODEL_PATH, EMOTION_LABELS
+from config import (
+    EMOTION_LABELS,
+    BATCH_WINDOW,
+    FRAME_SAMPLING,
+    SEEK_MIN_INTERVAL_FRAMES,
+    ADAPTIVE_SAMPLING,
+    ADAPTIVE_MIN_INTERVAL,
+    ADAPTIVE_MAX_INTERVAL,
+    ADAPTIVE_MOTION_THRESHOLD,
+    VIDEO_PIPELINE,
+    FACE_TRACKING,
+    TRACKING_DETECT_EVERY,
+    DETECTION_PARAMS,
+    CROP_REUSE,
+)
+from services.inference_backends import create_backend
+from services.face_tracker import FaceTracker
+from services.crop_reuse import CropReuse
+
+SAMPLING_MODES = ("read", "grab", "seek", "auto")
+
+# Kích thước cửa sổ của haarcascade_frontalface_default, khuôn mặt nhỏ hơn
+# kích thước này trên ảnh nhận diện sẽ không được tìm thấy
+CASCADE_WINDOW_SIZE = 24
+
+# Chiều rộng ảnh thu nhỏ dùng để đo chuyển động khi lấy mẫu thích ứng
+MOTION_THUMBNAIL_WIDTH = 64
+# Ảnh thay đổi được chia thành lưới MOTION_GRID x MOTION_GRID, lấy ô thay đổi
+# nhiều nhất để chuyển động nhỏ (khuôn mặt) không bị loãng trong cả khung hình
+MOTION_GRID = 4
+
+
+def seek_to_frame(cap, frame_idx):
+    """
+    Đưa cv2.VideoCapture tới đúng frame_idx (frame tiếp theo được đọc)
+
+    Seek theo CAP_PROP_POS_MSEC rồi kiểm tra lại vị trí; nếu decoder dừng
+    trước đích thì grab() tiếp, nếu vượt quá thì đọc lại từ đầu. Nhờ vậy
+    frame được lấy luôn trùng với khi đọc tuần tự.
+
+    Returns:
+        False nếu video kết thúc trước frame_idx
+    """
+    if frame_idx <= 0:
+        return True
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.set(cv2.CAP_PROP_POS_MSEC, frame_idx * 1000.0 / fps)
+    position = int(round(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+
+    if position > frame_idx:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        position = 0
+
+    while position < frame_idx:
+        if not cap.grab():
+            return False
+        position += 1
+
+    return True
+
+
+def motion_thumbnail(frame):
+    """Ảnh xám thu nhỏ của khung hình dùng để so sánh chuyển động"""
+    height, width = frame.shape[:2]
+    thumb_height = max(MOTION_GRID, int(height * MOTION_THUMBNAIL_WIDTH / width))
+    small = cv2.resize(
+        frame, (MOTION_THUMBNAIL_WIDTH, thumb_height), interpolation=cv2.INTER_AREA
+    )
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def motion_score(thumb_a, thumb_b):
+    """
+    Mức thay đổi giữa hai ảnh thu nhỏ (0-1): trung bình độ lệch tuyệt đối của
+    ô lưới thay đổi nhiều nhất
+    """
+    diff = cv2.absdiff(thumb_a, thumb_b)
+    cells = cv2.resize(diff, (MOTION_GRID, MOTION_GRID), interpolation=cv2.INTER_AREA)
+    return float(cells.max()) / 255.0
+
+
+def iter_adaptive_frames(
+    cap,
+    fps,
+    min_interval=ADAPTIVE_MIN_INTERVAL,
+    max_interval=ADAPTIVE_MAX_INTERVAL,
+    threshold=ADAPTIVE_MOTION_THRESHOLD,
+    start_frame=0,
+    end_frame=None,
+):
+    """
+    Duyệt các khung hình lấy mẫu theo mức chuyển động
+
+    Cứ mỗi min_interval giây một khung hình được giải mã và thu nhỏ để so với
+    mẫu gần nhất; khung hình được lấy mẫu khi thay đổi từ threshold trở lên
+    hoặc đã max_interval giây chưa lấy mẫu. Các frame ở giữa chỉ grab().
+
+    Args:
+        cap: cv2.VideoCapture đã mở
+        fps: Số khung hình mỗi giây của video
+        start_frame, end_frame: Đoạn [start_frame, end_frame) cần duyệt
+
+    Yields:
+        (frame_idx, frame) của các khung hình được lấy mẫu
+    """
+    probe_every = max(1, int(round(fps * min_interval)))
+    max_gap = max(probe_every, int(round(fps * max_interval)))
+
+    if not seek_to_frame(cap, start_frame):
+        return
+
+    reference = None
+    last_sampled = start_frame
+    frame_idx = start_frame
+    while end_frame is None or frame_idx < end_frame:
+        if (frame_idx - start_frame) % probe_every == 0:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            thumb = motion_thumbnail(frame)
+            if (
+                reference is None
+                or frame_idx - last_sampled >= max_gap
+                or motion_score(thumb, reference) >= threshold
+            ):
+                reference = thumb
+                last_sampled = frame_idx
+                yield frame_idx, frame
+        elif not cap.grab():
+            break
+
+        frame_idx += 1
+
+
+def iter_sampled_frames(
+    cap,
+    frames_per_interval,
+    frame_count,
+    sampling=FRAME_SAMPLING,
+    start_frame=0,
+    end_frame=None,
+):
+    """
+    Duyệt các khung hình lấy mẫu của video, chỉ giải mã màu những frame cần dùng
+
+    Args:
+        cap: cv2.VideoCapture đã mở
+        frames_per_interval: Số frame giữa hai lần lấy mẫu
+        frame_count: Tổng số frame của video
+        sampling: Chế độ lấy mẫu (read, grab, seek, auto)
+        start_frame: Frame bắt đầu, phải là bội số của frames_per_interval
+        end_frame: Frame kết thúc (không bao gồm); mặc định đọc tới hết video
+
+    Yields:
+        (frame_idx, frame) của các khung hình được lấy mẫu
+    """
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"Chế độ lấy mẫu không hợp lệ: {sampling}")
+
+    if start_frame % frames_per_interval != 0:
+        raise ValueError("start_frame phải là bội số của frames_per_interval")
+
+    if sampling == "auto":
+        sampling = "seek" if frames_per_interval >= SEEK_MIN_INTERVAL_FRAMES else "grab"
+
+    if sampling == "seek":
+        stop_frame = frame_count if end_frame is None else min(end_frame, frame_count)
+        # Nhảy thẳng tới từng frame cần lấy, decoder chỉ giải mã từ keyframe gần nhất
+        for frame_idx in range(start_frame, stop_frame, frames_per_interval):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame_idx, frame
+        return
 
+    if not seek_to_frame(cap, start_frame):
+        return
 
-class EmotionDetector:
-    def __init__(self, model_path=MODEL_PATH):
-        # Khởi tạo TensorRT engine
-        self.model_path = model_path
-        self.logger = trt.Logger(trt.Logger.WARNING)
-        self.runtime = trt.Runtime(self.logger)
+    frame_idx = start_frame
+    while end_frame is None or frame_idx < end_frame:
+        if frame_idx % frames_per_interval == 0:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame_idx, frame
+        elif sampling == "grab":
+            # grab() chỉ đọc frame, bỏ qua bước chuyển đổi màu của retrieve()
+            if not cap.grab():
+                break
+        else:
+            ret, _ = cap.read()
+            if not ret:
+                break
+
+        frame_idx += 1
 
-        # Tải model TensorRT
-        with open(self.model_path, "rb") as f:
-            self.engine = self.runtime.deserialize_cuda_engine(f.read())
 
-        self.context = self.engine.create_execution_context()
+class EmotionDetector:
+    def __init__(
+        self,
+        model_path=None,
+        backend=None,
+        detection_params=None,
+        scheduler=None,
+        **backend_kwargs,
+    ):
+        """
+        Args:
+            model_path: Đường dẫn model của backend; mặc định lấy theo config
+            backend: Tên backend (tensorrt, onnx, fake) hoặc một InferenceBackend
+                đã khởi tạo; mặc định lấy INFERENCE_BACKEND trong config
+            detection_params: Ghi đè DETECTION_PARAMS trong config
+            scheduler: InferenceScheduler dùng chung; khi có, việc suy luận được
+                gom lô với các luồng khác và backend lấy theo scheduler
+            backend_kwargs: Tham số truyền cho backend
+        """
+        self.scheduler = scheduler
+
+        # Khởi tạo engine suy luận
+        if model_path is not None:
+            backend_kwargs["model_path"] = model_path
+        if scheduler is not None:
+            backend = scheduler.backend
+        elif backend is None or isinstance(backend, str):
+            backend_args = {} if backend is None else {"name": backend}
+            backend = create_backend(**backend_args, **backend_kwargs)
+        self.backend = backend
 
         # Lấy kích thước đầu vào
-        self.input_shape = None
-        for binding in range(self.engine.num_bindings):
-            if self.engine.binding_is_input(binding):
-                self.input_shape = self.engine.get_binding_shape(binding)
-                break
+        self.input_shape = self.backend.input_shape
 
-        if self.input_shape is None:
-            raise ValueError("Không tìm thấy input binding trong model TensorRT")
+        self.detection_params = {**DETECTION_PARAMS, **(detection_params or {})}
 
-        # Khởi tạo face detector từ OpenCV
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        # Face detector của OpenCV được tạo riêng cho từng luồng
+        self._thread_local = threading.local()
+
+    @property
+    def face_cascade(self):
+        """
+        CascadeClassifier không an toàn khi dùng chung giữa nhiều luồng,
+        nên mỗi luồng (ví dụ worker của pipeline) có một bản riêng
+        """
+        face_cascade = getattr(self._thread_local, "face_cascade", None)
+        if face_cascade is None:
+            face_cascade = cv2.CascadeClassifier(
+                cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+            )
+            self._thread_local.face_cascade = face_cascade
+        return face_cascade
+
+    def detect_faces(self, gray, roi=None, detection_params=None):
+        """
+        Nhận diện khuôn mặt trên ảnh xám
+
+        Ảnh được thu nhỏ trước khi nhận diện, nhưng không nhỏ tới mức khuôn
+        mặt nhỏ nhất cần tìm lọt dưới cửa sổ của cascade.
+
+        Args:
+            gray: Khung hình ảnh xám
+            roi: Vùng tìm kiếm (x0, y0, x1, y1); mặc định là toàn khung hình
+            detection_params: Ghi đè self.detection_params cho lần gọi này
+
+        Returns:
+            List các hộp (x, y, w, h) theo tọa độ của khung hình đầy đủ
+        """
+        params = {**self.detection_params, **(detection_params or {})}
+        frame_height, frame_width = gray.shape[:2]
+
+        # Kích thước khuôn mặt nhỏ nhất tính theo khung hình gốc
+        min_face = max(
+            params["min_face_size"],
+            int(params["min_face_ratio"] * min(frame_height, frame_width)),
         )
 
-    def preprocess_frame(self, frame):
+        # Tỉ lệ thu nhỏ, giới hạn để khuôn mặt nhỏ nhất vẫn >= cửa sổ cascade
+        scale = 1.0
+        if params["max_width"] and frame_width > params["max_width"]:
+            scale = max(
+                params["max_width"] / frame_width, CASCADE_WINDOW_SIZE / min_face
+            )
+            scale = min(scale, 1.0)
+
+        offset_x, offset_y = 0, 0
+        if roi is not None:
+            offset_x, offset_y, x1, y1 = roi
+            gray = gray[offset_y:y1, offset_x:x1]
+
+        if scale < 1.0:
+            gray = cv2.resize(
+                gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+            )
+
+        min_size = max(1, int(min_face * scale))
+        faces = self.face_cascade.detectMultiScale(
+            gray,
+            scaleFactor=params["scale_factor"],
+            minNeighbors=params["min_neighbors"],
+            minSize=(min_size, min_size),
+        )
+
+        # Đổi tọa độ về khung hình gốc
+        return [
+            (
+                int(round(x / scale)) + offset_x,
+                int(round(y / scale)) + offset_y,
+                int(round(w / scale)),
+                int(round(h / scale)),
+            )
+            for x, y, w, h in faces
+        ]
+
+    def preprocess_frame(self, frame, tracker=None, detection_params=None):
         """
         Tiền xử lý khung hình để chuẩn bị cho việc nhận diện cảm xúc
+
+        Args:
+            frame: Khung hình BGR
+            tracker: FaceTracker của video đang xử lý; khi có, vị trí khuôn mặt
+                lấy từ tracker và mỗi vị trí kèm thêm track_id (x, y, w, h, id)
+            detection_params: Tham số nhận diện riêng cho video đang xử lý
         """
         # Chuyển sang ảnh xám
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
         # Nhận diện khuôn mặt
-        faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-        )
-
-        processed_faces = []
-        face_locations = []
+        if tracker is not None:
+            detect_faces = functools.partial(
+                self.detect_faces, detection_params=detection_params
+            )
+            faces = [
+                (*box, track_id) for track_id, box in tracker.update(gray, detect_faces)
+            ]
+        else:
+            faces = self.detect_faces(gray, detection_params=detection_params)
+
+        return self.crop_faces(gray, faces), list(faces)
+
+    def crop_faces(self, gray, faces):
+        """
+        Cắt và resize các khuôn mặt theo kích thước đầu vào của model
 
-        for x, y, w, h in faces:
-            # Cắt vùng khuôn mặt
-            face_roi = gray[y : y + h, x : x + w]
+        Mỗi khuôn mặt được cv2.resize ghi thẳng vào một hàng của mảng kết quả,
+        việc chuẩn hóa về float32 để dành cho lúc ghép lô (xem _fill_batch).
 
-            # Resize theo kích thước đầu vào của model
-            input_height, input_width = self.input_shape[
-                2:
-            ]  # Dạng [batch_size, channels, height, width]
-            resized_face = cv2.resize(face_roi, (input_width, input_height))
+        Returns:
+            Mảng uint8 dạng [số khuôn mặt, height, width]
+        """
+        # Dạng [batch_size, channels, height, width]
+        input_height, input_width = self.input_shape[2:]
+        crops = np.empty((len(faces), input_height, input_width), dtype=np.uint8)
 
-            # Chuẩn hóa
-            normalized_face = resized_face / 255.0
+        for i, face in enumerate(faces):
+            x, y, w, h = face[:4]
+            cv2.resize(
+                gray[y : y + h, x : x + w], (input_width, input_height), crops[i]
+            )
 
-            # Chuyển về định dạng NCHW [batch, channels, height, width]
-            processed_face = np.expand_dims(
-                np.expand_dims(normalized_face, axis=0), axis=0
-            ).astype(np.float32)
+        return crops
 
-            processed_faces.append(processed_face)
-            face_locations.append((x, y, w, h))
+    def _fill_batch(self, crops_list):
+        """
+        Ghép các khuôn mặt vào buffer NCHW float32 dùng lại giữa các lần suy luận
 
-        return processed_faces, face_locations
+        Buffer được cấp phát riêng cho từng luồng và chỉ lớn thêm khi lô vượt
+        quá kích thước hiện tại.
 
-    def detect_emotion(self, frame):
-        """
-        Nhận diện cảm xúc từ khung hình
+        Returns:
+            View [N, channels, height, width] của buffer, chỉ hợp lệ tới lần
+            gọi tiếp theo trên cùng luồng
         """
-        # Tiền xử lý khung hình
-        processed_faces, face_locations = self.preprocess_frame(frame)
+        total = sum(len(crops) for crops in crops_list)
+        batch = getattr(self._thread_local, "batch", None)
 
-        results = []
+        if batch is None or len(batch) < total:
+            capacity = max(total, self.backend.max_batch_size)
+            batch = np.empty((capacity, *self.input_shape[1:]), dtype=np.float32)
+            self._thread_local.batch = batch
 
-        for i, face in enumerate(processed_faces):
-            # Chuẩn bị bộ nhớ đầu vào và đầu ra
-            input_memory = cuda.mem_alloc(face.nbytes)
-            output = np.empty((1, len(EMOTION_LABELS)), dtype=np.float32)
-            output_memory = cuda.mem_alloc(output.nbytes)
+        offset = 0
+        for crops in crops_list:
+            count = len(crops)
+            batch[offset : offset + count, 0] = crops
+            offset += count
 
-            # Sao chép dữ liệu đầu vào vào GPU
-            cuda.memcpy_htod(input_memory, face)
+        # Chuẩn hóa tại chỗ, không tạo mảng float64 trung gian
+        np.divide(batch[:total], np.float32(255.0), out=batch[:total])
 
-            # Thực thi model
-            bindings = [int(input_memory), int(output_memory)]
-            self.context.execute_v2(bindings)
+        return batch[:total]
 
-            # Sao chép dữ liệu đầu ra từ GPU
-            cuda.memcpy_dtoh(output, output_memory)
-
-            # Giải phóng bộ nhớ
-            input_memory.free()
-            output_memory.free()
+    def _build_results(self, outputs, face_locations, reused=None):
+        """
+        Chuyển đầu ra của model thành danh sách kết quả cho từng khuôn mặt
 
-            # Xử lý kết quả
-            emotion_idx = np.argmax(output)
-            emotion = EMOTION_LABELS[emotion_idx]
-            confidence = float(output[0][emotion_idx])
+        Args:
+            reused: Cờ dùng lại kết quả cũ cho từng khuôn mặt (khi có CropReuse),
+                được ghi vào kết quả dưới khóa "reused"
+        """
+        results = []
 
-            # Lưu kết quả
-            x, y, w, h = face_locations[i]
+        for i, (output, location) in enumerate(zip(outputs, face_locations)):
+            x, y, w, h = location[:4]
+            emotion_idx = int(np.argmax(output))
             result = {
-                "emotion": emotion,
-                "confidence": confidence,
+                "emotion": EMOTION_LABELS[emotion_idx],
+                "confidence": float(output[emotion_idx]),
                 "face_coordinates": {
                     "x": int(x),
                     "y": int(y),
@@ -125,17 +424,135 @@ class EmotionDetector:
                     "height": int(h),
                 },
             }
+            if len(location) > 4:
+                result["track_id"] = int(location[4])
+            if reused is not None:
+                result["reused"] = reused[i]
             results.append(result)
 
         return results
 
-    def process_video(self, video_path, interval=1.0):
+    def detect_emotion(self, frame, priority="upload", reuse=None):
+        """
+        Nhận diện cảm xúc từ khung hình
+        """
+        return self.detect_emotions_batch([frame], priority, reuse)[0]
+
+    def detect_emotions_batch(self, frames, priority="upload", reuse=None):
+        """
+        Nhận diện cảm xúc cho nhiều khung hình với một lần suy luận duy nhất
+
+        Returns:
+            List kết quả cho từng khung hình, cùng định dạng với detect_emotion
+        """
+        return self.infer_preprocessed(
+            [self.preprocess_frame(frame) for frame in frames], priority, reuse
+        )
+
+    def _infer_crops(self, crops_list, priority):
+        if self.scheduler is not None:
+            return self.scheduler.infer(np.concatenate(crops_list), priority)
+        return self.backend.infer(self._fill_batch(crops_list))
+
+    def infer_preprocessed(self, preprocessed_frames, priority="upload", reuse=None):
+        """
+        Suy luận một lô từ kết quả preprocess_frame của nhiều khung hình
+
+        Args:
+            preprocessed_frames: List các cặp (processed_faces, face_locations)
+            priority: Loại yêu cầu khi dùng scheduler, "live" (camera trực
+                tiếp) được ưu tiên hơn "upload" (xử lý video)
+            reuse: CropReuse của video/luồng camera đang xử lý; khuôn mặt gần
+                như không đổi dùng lại kết quả cũ thay vì suy luận lại
+
+        Returns:
+            List kết quả cho từng khung hình, cùng định dạng với detect_emotion
+        """
+        all_crops = []
+        all_locations = []
+        face_counts = []
+
+        # Gom khuôn mặt của tất cả khung hình vào cùng một lô
+        for crops, face_locations in preprocessed_frames:
+            all_crops.append(crops)
+            all_locations.extend(face_locations)
+            face_counts.append(len(crops))
+
+        if not all_locations:
+            return [[] for _ in preprocessed_frames]
+
+        if reuse is None:
+            outputs = self._infer_crops(all_crops, priority)
+            results = self._build_results(outputs, all_locations)
+        else:
+            # Các khung hình được ghép theo thứ tự, khuôn mặt ở khung hình sau
+            # có thể dùng kết quả của khung hình trước trong cùng lô
+            to_infer = []
+            assigned = []
+            for crops, face_locations in preprocessed_frames:
+                assigned.extend(reuse.assign(crops, face_locations, to_infer))
+
+            new_outputs = []
+            if to_infer:
+                new_outputs = self._infer_crops([np.stack(to_infer)], priority)
+                reuse.resolve(new_outputs)
+
+            outputs = [
+                new_outputs[source] if isinstance(source, int) else source
+                for source, _ in assigned
+            ]
+            reused = [was_reused for _, was_reused in assigned]
+            results = self._build_results(outputs, all_locations, reused)
+
+        # Tách kết quả về lại từng khung hình
+        frame_results = []
+        offset = 0
+        for count in face_counts:
+            frame_results.append(results[offset : offset + count])
+            offset += count
+
+        return frame_results
+
+    def process_video(
+        self,
+        video_path,
+        interval=1.0,
+        batch_window=BATCH_WINDOW,
+        sampling=FRAME_SAMPLING,
+        pipelined=VIDEO_PIPELINE,
+        tracking=FACE_TRACKING,
+        detect_every=TRACKING_DETECT_EVERY,
+        detection_params=None,
+        crop_reuse=CROP_REUSE,
+        adaptive=ADAPTIVE_SAMPLING,
+        start_frame=0,
+        end_frame=None,
+        progress_callback=None,
+    ):
         """
         Xử lý video và trích xuất cảm xúc theo khoảng thời gian
 
         Args:
             video_path: Đường dẫn đến file video
             interval: Khoảng thời gian (giây) giữa các lần nhận diện
+            batch_window: Số khung hình lấy mẫu được suy luận chung trong một lô
+            sampling: Cách đọc khung hình (read, grab, seek, auto)
+            pipelined: Chạy giải mã, nhận diện khuôn mặt và suy luận song song
+                theo từng giai đoạn (xem VideoPipeline)
+            tracking: Theo dõi khuôn mặt giữa các mẫu thay vì nhận diện lại
+                toàn khung hình; kết quả có thêm track_id
+            detect_every: Số mẫu giữa hai lần nhận diện toàn khung hình khi
+                bật tracking
+            detection_params: Tham số nhận diện khuôn mặt riêng cho video này
+                (max_width, min_face_ratio, scale_factor, ...)
+            crop_reuse: Dùng lại kết quả khi khuôn mặt gần như không đổi so với
+                mẫu trước (xem CropReuse); kết quả có thêm cờ reused
+            adaptive: Lấy mẫu theo chuyển động trong khoảng [ADAPTIVE_MIN_INTERVAL,
+                ADAPTIVE_MAX_INTERVAL] thay vì mỗi interval giây (xem
+                iter_adaptive_frames)
+            start_frame, end_frame: Chỉ xử lý đoạn [start_frame, end_frame) của
+                video (dùng khi chia video cho nhiều tiến trình)
+            progress_callback: Hàm nhận tỉ lệ hoàn thành (0-1) sau mỗi lô
 
         Returns:
             List các kết quả nhận diện cảm xúc theo thời gian
@@ -151,30 +568,86 @@ class EmotionDetector:
         duration = frame_count / fps
 
         # Tính số frame cần nhảy qua giữa các lần nhận diện
-        frames_per_interval = int(fps * interval)
+        frames_per_interval = max(1, int(fps * interval))
+
+        # Trạng thái theo dõi khuôn mặt chỉ dùng trong một video
+        tracker = FaceTracker(detect_every) if tracking else None
+        reuse = CropReuse() if crop_reuse else None
+
+        # Quy đổi timestamp đã xử lý thành tỉ lệ hoàn thành của đoạn video
+        report_progress = None
+        if progress_callback is not None:
+            start_time = start_frame / fps
+            end_time = duration if end_frame is None else min(end_frame / fps, duration)
+
+            def report_progress(current_time):
+                span = max(end_time - start_time, 1e-6)
+                progress_callback(min(1.0, (current_time - start_time) / span))
+
+        if adaptive:
+            sampled_frames = iter_adaptive_frames(
+                cap, fps, start_frame=start_frame, end_frame=end_frame
+            )
+        else:
+            sampled_frames = iter_sampled_frames(
+                cap, frames_per_interval, frame_count, sampling, start_frame, end_frame
+            )
+
+        if pipelined:
+            # Import tại chỗ để tránh vòng lặp import giữa hai module
+            from services.video_pipeline import VideoPipeline
+
+            pipeline = VideoPipeline(self, batch_window=batch_window)
+            try:
+                results = pipeline.run(
+                    sampled_frames,
+                    fps,
+                    tracker,
+                    detection_params,
+                    report_progress,
+                    reuse,
+                )
+            finally:
+                cap.release()
+            return results, duration
 
         results = []
-        frame_idx = 0
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
 
-            # Chỉ xử lý frame theo khoảng thời gian
-            if frame_idx % frames_per_interval == 0:
-                # Tính thời điểm hiện tại trong video
-                current_time = frame_idx / fps
+        # Các khung hình đang chờ được suy luận chung một lô
+        pending_frames = []
+        pending_times = []
 
-                # Nhận diện cảm xúc
-                emotion_results = self.detect_emotion(frame)
+        def flush_pending():
+            batch_results = self.infer_preprocessed(
+                [
+                    self.preprocess_frame(frame, tracker, detection_params)
+                    for frame in pending_frames
+                ],
+                reuse=reuse,
+            )
 
+            for current_time, emotion_results in zip(pending_times, batch_results):
                 # Thêm thông tin thời gian vào kết quả
                 for result in emotion_results:
                     result["timestamp"] = current_time
-                    results.extend(emotion_results)
+                results.extend(emotion_results)
+
+            if report_progress is not None:
+                report_progress(pending_times[-1])
+
+            pending_frames.clear()
+            pending_times.clear()
+
+        for frame_idx, frame in sampled_frames:
+            # Tính thời điểm hiện tại trong video
+            pending_times.append(frame_idx / fps)
+            pending_frames.append(frame)
+
+            if len(pending_frames) >= batch_window:
+                flush_pending()
 
-            frame_idx += 1
+        if pending_frames:
+            flush_pending()
 
         cap.release()
 
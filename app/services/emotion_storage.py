@@ -0,0 +1,56 @@
+import json
+from sqlalchemy import insert, literal, select
+from sqlalchemy.orm import Session
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from config import EMOTION_INSERT_CHUNK_SIZE
+from models.video import EmotionData
+
+
+def bulk_insert_emotions(
+    db: Session, video_id: int, emotion_results, chunk_size=EMOTION_INSERT_CHUNK_SIZE
+):
+    """
+    Ghi kết quả nhận diện vào emotion_data theo từng lô bằng executemany,
+    không tạo đối tượng ORM cho từng dòng. Không commit, để chung transaction
+    với người gọi.
+    """
+    statement = insert(EmotionData)
+    rows = []
+
+    for result in emotion_results:
+        rows.append(
+            {
+                "video_id": video_id,
+                "timestamp": result["timestamp"],
+                "emotion": result["emotion"],
+                "confidence": result["confidence"],
+                # Chuyển đổi tọa độ khuôn mặt sang chuỗi JSON
+                "face_coordinates": json.dumps(result["face_coordinates"]),
+            }
+        )
+
+        if len(rows) >= chunk_size:
+            db.execute(statement, rows)
+            rows = []
+
+    if rows:
+        db.execute(statement, rows)
+
+
+def copy_emotions(db: Session, source_video_id: int, video_id: int):
+    """
+    Sao chép dữ liệu cảm xúc của một video sang video khác bằng một câu lệnh
+    INSERT ... SELECT, không đọc dữ liệu về ứng dụng. Không commit.
+    """
+    columns = ["timestamp", "emotion", "confidence", "face_coordinates"]
+    source = select(
+        literal(video_id).label("video_id"),
+        *(EmotionData.__table__.c[column] for column in columns),
+    ).where(EmotionData.video_id == source_video_id)
+    # Giữ thứ tự id để phân trang theo (timestamp, id) cho cùng kết quả
+    source = source.order_by(EmotionData.id)
+    db.execute(insert(EmotionData).from_select(["video_id", *columns], source))
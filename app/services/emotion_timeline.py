@@ -0,0 +1,160 @@
+import os
+import shutil
+import numpy as np
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from config import EMOTION_LABELS
+
+# Chỉ số của từng cảm xúc trong EMOTION_LABELS
+EMOTION_INDEX = {label: idx for idx, label in enumerate(EMOTION_LABELS)}
+
+
+class EmotionTimeline:
+    """
+    Dữ liệu cảm xúc của một video lưu theo cột trong các mảng liên tục:
+
+    - timestamps: float64, thời điểm (giây) của mỗi lần nhận diện
+    - emotions: uint8, chỉ số vào EMOTION_LABELS
+    - confidences: float16
+    - boxes: int16 [N, 4] dạng (x, y, width, height)
+
+    Mỗi cột là một file .npy trong thư mục timeline nằm cạnh file video, khi
+    đọc được memory-map nên chỉ phần dữ liệu thật sự dùng mới được nạp.
+    """
+
+    COLUMNS = {
+        "timestamps": np.float64,
+        "emotions": np.uint8,
+        "confidences": np.float16,
+        "boxes": np.int16,
+    }
+
+    def __init__(self, timestamps, emotions, confidences, boxes):
+        self.timestamps = timestamps
+        self.emotions = emotions
+        self.confidences = confidences
+        self.boxes = boxes
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_results(cls, emotion_results):
+        """
+        Tạo timeline từ kết quả của EmotionDetector.process_video
+        """
+        count = len(emotion_results)
+        timeline = cls(
+            *(
+                np.empty((count, 4) if name == "boxes" else count, dtype=dtype)
+                for name, dtype in cls.COLUMNS.items()
+            )
+        )
+
+        for i, result in enumerate(emotion_results):
+            coordinates = result["face_coordinates"]
+            timeline.timestamps[i] = result["timestamp"]
+            timeline.emotions[i] = EMOTION_INDEX[result["emotion"]]
+            timeline.confidences[i] = result["confidence"]
+            timeline.boxes[i] = (
+                coordinates["x"],
+                coordinates["y"],
+                coordinates["width"],
+                coordinates["height"],
+            )
+
+        return timeline
+
+    @staticmethod
+    def path_for(video_path):
+        return f"{video_path}.timeline"
+
+    def save(self, path):
+        """
+        Ghi timeline vào thư mục path (ghi ra thư mục tạm rồi đổi tên để
+        người đọc không thấy dữ liệu ghi dở)
+        """
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        for name, dtype in self.COLUMNS.items():
+            column = np.ascontiguousarray(getattr(self, name), dtype=dtype)
+            np.save(os.path.join(tmp_path, f"{name}.npy"), column)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Đọc timeline; mặc định các cột là memory-map chỉ đọc (view NumPy)
+        """
+        mmap_mode = "r" if mmap else None
+        return cls(
+            *(
+                np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+                for name in cls.COLUMNS
+            )
+        )
+
+    @staticmethod
+    def delete(path):
+        shutil.rmtree(path, ignore_errors=True)
+
+    def emotion_counts(self):
+        """
+        Đếm số lần xuất hiện của từng cảm xúc (chỉ gồm cảm xúc có xuất hiện)
+        """
+        counts = np.bincount(self.emotions, minlength=len(EMOTION_LABELS))
+        return {
+            EMOTION_LABELS[idx]: int(count) for idx, count in enumerate(counts) if count
+        }
+
+    def bucketize(self, bucket_seconds, num_buckets):
+        """
+        Gom các lần nhận diện theo khoảng thời gian bucket_seconds bằng bincount
+
+        Returns:
+            Dict các mảng độ dài num_buckets:
+            - face_counts: số khuôn mặt nhận diện được trong mỗi khoảng
+            - confidence_sums: tổng độ tin cậy
+            - emotion_counts: [num_buckets, len(EMOTION_LABELS)] số lần của
+              từng cảm xúc
+        """
+        buckets = np.floor_divide(self.timestamps, bucket_seconds).astype(np.int64)
+        # Lần nhận diện ở đúng cuối video thuộc khoảng cuối cùng
+        np.clip(buckets, 0, num_buckets - 1, out=buckets)
+
+        num_labels = len(EMOTION_LABELS)
+        emotion_counts = np.bincount(
+            buckets * num_labels + self.emotions,
+            minlength=num_buckets * num_labels,
+        ).reshape(num_buckets, num_labels)
+
+        return {
+            "face_counts": emotion_counts.sum(axis=1),
+            "confidence_sums": np.bincount(
+                buckets,
+                weights=self.confidences.astype(np.float64),
+                minlength=num_buckets,
+            ),
+            "emotion_counts": emotion_counts,
+        }
+
+    def iter_rows(self, start=0, stop=None):
+        """
+        Duyệt timeline dưới dạng các dòng giống EmotionData
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+
+        for i in range(start, stop):
+            x, y, width, height = (int(value) for value in self.boxes[i])
+            yield {
+                "timestamp": float(self.timestamps[i]),
+                "emotion": EMOTION_LABELS[self.emotions[i]],
+                "confidence": float(self.confidences[i]),
+                "face_coordinates": {"x": x, "y": y, "width": width, "height": height},
+            }
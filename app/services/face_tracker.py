@@ -0,0 +1,147 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from config import TRACKING_DETECT_EVERY, TRACKING_IOU_THRESHOLD, TRACKING_MAX_MISSED
+
+
+def box_iou(box_a, box_b):
+    """
+    Tính IoU giữa hai hộp dạng (x, y, w, h)
+    """
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+
+    intersection = inter_w * inter_h
+    return intersection / float(aw * ah + bw * bh - intersection)
+
+
+class FaceTrack:
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        # Số lần lấy mẫu liên tiếp không tìm thấy khuôn mặt
+        self.missed = 0
+
+
+class FaceTracker:
+    """
+    Theo dõi khuôn mặt giữa các khung hình lấy mẫu của một video
+
+    Cứ detect_every mẫu mới chạy nhận diện trên toàn khung hình. Ở các mẫu
+    còn lại chỉ tìm trong vùng nhỏ quanh vị trí cũ của từng khuôn mặt, sau đó
+    ghép với track cũ theo IoU để giữ nguyên track_id.
+    """
+
+    def __init__(
+        self,
+        detect_every=TRACKING_DETECT_EVERY,
+        iou_threshold=TRACKING_IOU_THRESHOLD,
+        max_missed=TRACKING_MAX_MISSED,
+        search_margin=0.5,
+    ):
+        self.detect_every = max(1, detect_every)
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        # Vùng tìm kiếm được nới rộng thêm search_margin * kích thước khuôn mặt
+        self.search_margin = search_margin
+
+        self.tracks = []
+        self.sample_count = 0
+        self.next_track_id = 1
+
+    def _search_region(self, box, frame_shape):
+        x, y, w, h = box
+        margin_x = int(w * self.search_margin)
+        margin_y = int(h * self.search_margin)
+        frame_height, frame_width = frame_shape[:2]
+
+        return (
+            max(0, x - margin_x),
+            max(0, y - margin_y),
+            min(frame_width, x + w + margin_x),
+            min(frame_height, y + h + margin_y),
+        )
+
+    def _match(self, boxes):
+        """
+        Ghép các hộp mới với track hiện có theo IoU (tham lam, IoU lớn trước)
+        """
+        candidates = []
+        for track_idx, track in enumerate(self.tracks):
+            for box_idx, box in enumerate(boxes):
+                iou = box_iou(track.box, box)
+                if iou >= self.iou_threshold:
+                    candidates.append((iou, track_idx, box_idx))
+
+        matches = {}
+        used_boxes = set()
+        for _, track_idx, box_idx in sorted(candidates, reverse=True):
+            if track_idx in matches or box_idx in used_boxes:
+                continue
+            matches[track_idx] = box_idx
+            used_boxes.add(box_idx)
+
+        return matches, used_boxes
+
+    def update(self, gray, detect_faces):
+        """
+        Cập nhật các track với khung hình lấy mẫu tiếp theo
+
+        Args:
+            gray: Khung hình ảnh xám
+            detect_faces: Hàm detect_faces(gray, roi) của EmotionDetector
+
+        Returns:
+            List các cặp (track_id, (x, y, w, h)) của khuôn mặt trong khung hình
+        """
+        full_detection = self.sample_count % self.detect_every == 0 or not self.tracks
+        self.sample_count += 1
+
+        if full_detection:
+            boxes = list(detect_faces(gray))
+        else:
+            # Chỉ tìm quanh vị trí cũ, mỗi track giữ hộp khớp nhất
+            boxes = []
+            for track in self.tracks:
+                roi = self._search_region(track.box, gray.shape)
+                found = detect_faces(gray, roi)
+                if len(found):
+                    best = max(found, key=lambda box: box_iou(track.box, box))
+                    # Hai vùng tìm kiếm chồng nhau có thể trả về cùng một hộp
+                    if best not in boxes:
+                        boxes.append(best)
+
+        matches, used_boxes = self._match(boxes)
+
+        tracked_faces = []
+        remaining_tracks = []
+        for track_idx, track in enumerate(self.tracks):
+            if track_idx in matches:
+                track.box = boxes[matches[track_idx]]
+                track.missed = 0
+                tracked_faces.append((track.track_id, track.box))
+            else:
+                track.missed += 1
+
+            if track.missed <= self.max_missed:
+                remaining_tracks.append(track)
+
+        self.tracks = remaining_tracks
+
+        # Khuôn mặt mới chỉ xuất hiện ở lần nhận diện toàn khung hình
+        for box_idx, box in enumerate(boxes):
+            if box_idx in used_boxes or not full_detection:
+                continue
+            track = FaceTrack(self.next_track_id, box)
+            self.next_track_id += 1
+            self.tracks.append(track)
+            tracked_faces.append((track.track_id, track.box))
+
+        return tracked_faces
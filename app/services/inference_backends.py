@@ -0,0 +1,258 @@
+import threading
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from config import (
+    MODEL_PATH,
+    ONNX_MODEL_PATH,
+    EMOTION_LABELS,
+    MAX_BATCH_SIZE,
+    INFERENCE_BACKEND,
+    INFERENCE_THREADS,
+    MODEL_INPUT_SIZE,
+)
+
+
+class InferenceBackend:
+    """
+    Giao diện chung cho các engine suy luận cảm xúc
+
+    Mỗi backend nhận một lô khuôn mặt dạng NCHW (float32) và trả về mảng
+    xác suất [N, số nhãn cảm xúc].
+    """
+
+    name = None
+
+    def __init__(self):
+        # Dạng [batch_size, channels, height, width]
+        self.input_shape = None
+        self.max_batch_size = MAX_BATCH_SIZE
+
+    def infer(self, batch):
+        raise NotImplementedError
+
+
+class TensorRTBackend(InferenceBackend):
+    name = "tensorrt"
+
+    def __init__(self, model_path=MODEL_PATH, max_batch_size=MAX_BATCH_SIZE):
+        super().__init__()
+        # Chỉ import TensorRT/CUDA khi thật sự dùng backend này
+        import tensorrt as trt
+        import pycuda.driver as cuda
+
+        self.cuda = cuda
+        self.model_path = model_path
+        # Buffer host/device và execution context dùng chung cho mọi lần gọi,
+        # nên các luồng (job worker, pipeline, live) phải suy luận lần lượt
+        self._lock = threading.Lock()
+
+        # Context CUDA riêng của backend thay cho pycuda.autoinit: autoinit chỉ
+        # làm context hiện hành trên luồng import nó lần đầu, trong khi backend
+        # có thể được tạo và gọi từ các luồng khác nhau
+        cuda.init()
+        self.cuda_context = cuda.Device(0).retain_primary_context()
+        self.cuda_context.push()
+        try:
+            self._load_engine(trt, max_batch_size)
+        finally:
+            self.cuda_context.pop()
+
+    def _load_engine(self, trt, max_batch_size):
+        """Nạp engine và cấp phát buffer; gọi khi context CUDA đang hiện hành"""
+        cuda = self.cuda
+
+        self.logger = trt.Logger(trt.Logger.WARNING)
+        self.runtime = trt.Runtime(self.logger)
+
+        # Tải model TensorRT
+        with open(self.model_path, "rb") as f:
+            self.engine = self.runtime.deserialize_cuda_engine(f.read())
+
+        self.context = self.engine.create_execution_context()
+
+        # Lấy kích thước đầu vào
+        for binding in range(self.engine.num_bindings):
+            if self.engine.binding_is_input(binding):
+                self.input_shape = self.engine.get_binding_shape(binding)
+                break
+
+        if self.input_shape is None:
+            raise ValueError("Không tìm thấy input binding trong model TensorRT")
+
+        # Engine có batch động khi chiều batch là -1
+        self.dynamic_batch = self.input_shape[0] == -1
+        if self.dynamic_batch:
+            # Giới hạn theo optimization profile của engine
+            profile_max = self.engine.get_profile_shape(0, 0)[2]
+            self.max_batch_size = min(max_batch_size, profile_max[0])
+        else:
+            self.max_batch_size = self.input_shape[0]
+
+        # Cấp phát bộ nhớ đầu vào/đầu ra một lần và dùng lại cho mọi lần suy luận
+        channels, input_height, input_width = self.input_shape[1:]
+        self.host_input = cuda.pagelocked_empty(
+            (self.max_batch_size, channels, input_height, input_width), np.float32
+        )
+        self.host_output = cuda.pagelocked_empty(
+            (self.max_batch_size, len(EMOTION_LABELS)), np.float32
+        )
+        self.input_memory = cuda.mem_alloc(self.host_input.nbytes)
+        self.output_memory = cuda.mem_alloc(self.host_output.nbytes)
+        self.bindings = [int(self.input_memory), int(self.output_memory)]
+
+    def infer(self, batch):
+        with self._lock:
+            self.cuda_context.push()
+            try:
+                return self._infer(batch)
+            finally:
+                self.cuda_context.pop()
+
+    def _infer(self, batch):
+        cuda = self.cuda
+        outputs = np.empty((len(batch), len(EMOTION_LABELS)), dtype=np.float32)
+
+        for start in range(0, len(batch), self.max_batch_size):
+            chunk = batch[start : start + self.max_batch_size]
+            n = len(chunk)
+            self.host_input[:n] = chunk
+
+            if self.dynamic_batch:
+                # Chỉ sao chép và tính toán đúng số khuôn mặt trong lô
+                self.context.set_binding_shape(0, (n,) + tuple(self.input_shape[1:]))
+                cuda.memcpy_htod(self.input_memory, self.host_input[:n])
+                self.context.execute_v2(self.bindings)
+                cuda.memcpy_dtoh(self.host_output[:n], self.output_memory)
+            else:
+                # Engine batch cố định: chạy toàn bộ buffer, phần thừa bị bỏ qua
+                cuda.memcpy_htod(self.input_memory, self.host_input)
+                self.context.execute_v2(self.bindings)
+                cuda.memcpy_dtoh(self.host_output, self.output_memory)
+
+            outputs[start : start + n] = self.host_output[:n]
+
+        return outputs
+
+
+class OnnxCPUBackend(InferenceBackend):
+    """
+    Chạy cùng model đã export sang ONNX trên CPU
+
+    Ưu tiên ONNX Runtime, nếu không cài thì dùng cv2.dnn.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path=ONNX_MODEL_PATH,
+        num_threads=INFERENCE_THREADS,
+        max_batch_size=MAX_BATCH_SIZE,
+    ):
+        super().__init__()
+        self.model_path = model_path
+        self.max_batch_size = max_batch_size
+
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            ort = None
+
+        if ort is not None:
+            options = ort.SessionOptions()
+            if num_threads > 0:
+                options.intra_op_num_threads = num_threads
+            self.session = ort.InferenceSession(
+                model_path, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+            model_input = self.session.get_inputs()[0]
+            self.input_name = model_input.name
+            self.net = None
+
+            # Chiều batch (và có thể cả H, W) là động trong model export
+            shape = [dim if isinstance(dim, int) else -1 for dim in model_input.shape]
+            if any(dim == -1 for dim in shape[1:]):
+                shape = [-1, *MODEL_INPUT_SIZE]
+            self.input_shape = [-1] + shape[1:]
+        else:
+            import cv2
+
+            if num_threads > 0:
+                cv2.setNumThreads(num_threads)
+            self.session = None
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+            # Khác InferenceSession, cv2.dnn.Net không gọi song song được
+            self._lock = threading.Lock()
+            # cv2.dnn không cho biết kích thước đầu vào, lấy từ cấu hình
+            self.input_shape = [-1, *MODEL_INPUT_SIZE]
+
+    def infer(self, batch):
+        outputs = []
+
+        for start in range(0, len(batch), self.max_batch_size):
+            chunk = np.ascontiguousarray(batch[start : start + self.max_batch_size])
+            if self.session is not None:
+                output = self.session.run(None, {self.input_name: chunk})[0]
+            else:
+                with self._lock:
+                    self.net.setInput(chunk)
+                    output = self.net.forward()
+            outputs.append(output.reshape(len(chunk), -1))
+
+        return np.concatenate(outputs, axis=0).astype(np.float32, copy=False)
+
+
+class FakeBackend(InferenceBackend):
+    """
+    Backend tất định dùng cho kiểm thử, không cần model hay GPU
+
+    Nhãn được suy ra từ độ sáng trung bình của khuôn mặt nên cùng một ảnh
+    luôn cho cùng một kết quả.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        model_path=None,
+        input_size=MODEL_INPUT_SIZE,
+        max_batch_size=MAX_BATCH_SIZE,
+    ):
+        # model_path nhận cho cùng giao diện với các backend khác, không dùng
+        super().__init__()
+        self.input_shape = [-1, *input_size]
+        self.max_batch_size = max_batch_size
+
+    def infer(self, batch):
+        n = len(batch)
+        num_labels = len(EMOTION_LABELS)
+
+        means = batch.reshape(n, -1).mean(axis=1)
+        emotion_idx = (means * 1000).astype(np.int64) % num_labels
+
+        outputs = np.full((n, num_labels), 0.1 / (num_labels - 1), dtype=np.float32)
+        outputs[np.arange(n), emotion_idx] = 0.9
+        return outputs
+
+
+BACKENDS = {
+    TensorRTBackend.name: TensorRTBackend,
+    OnnxCPUBackend.name: OnnxCPUBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def create_backend(name=INFERENCE_BACKEND, **kwargs):
+    """
+    Tạo backend suy luận theo tên cấu hình (tensorrt, onnx, fake)
+    """
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        raise ValueError(
+            f"Backend suy luận không hợp lệ: {name} (hỗ trợ: {', '.join(BACKENDS)})"
+        )
+    return backend_class(**kwargs)
@@ -0,0 +1,306 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from config import (
+    EMOTION_LABELS,
+    INFERENCE_SCHEDULER,
+    SCHEDULER_MAX_BATCH_SIZE,
+    SCHEDULER_LIVE_MAX_WAIT_MS,
+    SCHEDULER_UPLOAD_MAX_WAIT_MS,
+    SCHEDULER_UPLOAD_SHARE,
+)
+from services.inference_backends import create_backend
+from utils.metrics import Histogram, LatencyRecorder
+
+# Loại yêu cầu: khung hình camera trực tiếp hoặc video tải lên
+LIVE = "live"
+UPLOAD = "upload"
+PRIORITIES = (LIVE, UPLOAD)
+
+BATCH_SIZE_BOUNDS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+QUEUE_DELAY_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500]
+
+
+class _Request:
+    """Các khuôn mặt của một lần gọi infer, có thể được chia vào nhiều lô"""
+
+    __slots__ = ("crops", "outputs", "next", "remaining", "future", "enqueued_at")
+
+    def __init__(self, crops, num_labels):
+        self.crops = crops
+        self.outputs = np.empty((len(crops), num_labels), dtype=np.float32)
+        # Vị trí khuôn mặt đầu tiên chưa được đưa vào lô
+        self.next = 0
+        self.remaining = len(crops)
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class InferenceScheduler:
+    """
+    Gom khuôn mặt của nhiều luồng (camera trực tiếp, video tải lên) thành lô
+    và suy luận trên một luồng duy nhất
+
+    Lô được chạy khi đủ max_batch_size khuôn mặt hoặc khi yêu cầu đến sớm
+    nhất đã chờ hết max wait của loại đó. Yêu cầu live được ưu tiên xếp vào
+    lô, upload chỉ được giữ SCHEDULER_UPLOAD_SHARE số chỗ khi có live đang chờ
+    và có thể bị chia nhỏ qua nhiều lô, nên một video lớn không làm live phải
+    chờ quá một lô.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        max_batch_size=SCHEDULER_MAX_BATCH_SIZE,
+        live_max_wait_ms=SCHEDULER_LIVE_MAX_WAIT_MS,
+        upload_max_wait_ms=SCHEDULER_UPLOAD_MAX_WAIT_MS,
+        upload_share=SCHEDULER_UPLOAD_SHARE,
+    ):
+        """
+        Args:
+            backend: InferenceBackend dùng chung; mặc định tạo theo config
+                ngay trên luồng suy luận
+            max_batch_size: Số khuôn mặt tối đa của một lô (0 = theo backend)
+        """
+        self.max_wait = {
+            LIVE: live_max_wait_ms / 1000,
+            UPLOAD: upload_max_wait_ms / 1000,
+        }
+
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        # Số khuôn mặt đang chờ của mỗi loại
+        self._pending = {priority: 0 for priority in PRIORITIES}
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self.batches = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BOUNDS)
+        self.queue_delays = {
+            priority: Histogram(QUEUE_DELAY_BOUNDS_MS) for priority in PRIORITIES
+        }
+        self.queue_latency = {priority: LatencyRecorder() for priority in PRIORITIES}
+
+        # Backend được tạo trên chính luồng suy luận (context CUDA gắn với
+        # luồng), __init__ chờ tới khi backend sẵn sàng
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(backend, max_batch_size, upload_share),
+            name="inference-scheduler",
+            daemon=True,
+        )
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            raise self._startup_error
+
+    def _setup(self, backend, max_batch_size, upload_share):
+        """Tạo backend và buffer của lô; chạy trên luồng suy luận"""
+        self.backend = backend if backend is not None else create_backend()
+        self.input_shape = self.backend.input_shape
+        self.max_batch_size = max_batch_size or self.backend.max_batch_size
+        self.upload_slots = max(1, int(self.max_batch_size * upload_share))
+        self._batch = np.empty(
+            (self.max_batch_size, *self.input_shape[1:]), dtype=np.float32
+        )
+
+    def submit(self, crops, priority=UPLOAD):
+        """
+        Đưa các khuôn mặt vào hàng đợi
+
+        Args:
+            crops: Mảng uint8 [N, height, width] (xem EmotionDetector.crop_faces)
+            priority: LIVE hoặc UPLOAD
+
+        Returns:
+            Future nhận mảng xác suất [N, số nhãn cảm xúc]
+        """
+        request = _Request(crops, len(EMOTION_LABELS))
+        if not len(crops):
+            request.future.set_result(request.outputs)
+            return request.future
+
+        if tuple(crops.shape[1:]) != tuple(self.input_shape[2:]):
+            raise ValueError(
+                f"Kích thước khuôn mặt {tuple(crops.shape[1:])} không khớp "
+                f"với đầu vào của model {tuple(self.input_shape[2:])}"
+            )
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("InferenceScheduler đã dừng")
+            self._queues[priority].append(request)
+            self._pending[priority] += len(crops)
+            self._condition.notify()
+
+        return request.future
+
+    def infer(self, crops, priority=UPLOAD):
+        """Suy luận các khuôn mặt và chờ kết quả"""
+        return self.submit(crops, priority).result()
+
+    def close(self):
+        """Dừng luồng suy luận sau khi chạy hết các yêu cầu đang chờ"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _next_deadline(self):
+        return min(
+            queue[0].enqueued_at + self.max_wait[priority]
+            for priority, queue in self._queues.items()
+            if queue
+        )
+
+    def _wait_for_batch(self):
+        """Chờ đến khi đủ một lô hoặc hết thời gian chờ; gọi khi giữ lock"""
+        while not any(self._queues.values()):
+            if self._closed:
+                return False
+            self._condition.wait()
+
+        while sum(self._pending.values()) < self.max_batch_size and not self._closed:
+            timeout = self._next_deadline() - time.monotonic()
+            if timeout <= 0:
+                break
+            self._condition.wait(timeout)
+
+        return True
+
+    def _take(self, priority, limit, items):
+        """Lấy tối đa limit khuôn mặt của một loại vào lô; gọi khi giữ lock"""
+        queue = self._queues[priority]
+        taken = 0
+        now = time.monotonic()
+
+        while queue and taken < limit:
+            request = queue[0]
+            if request.future.done():
+                # Yêu cầu đã lỗi ở lô trước, bỏ phần còn lại
+                queue.popleft()
+                self._pending[priority] -= len(request.crops) - request.next
+                continue
+            if request.next == 0:
+                delay_ms = (now - request.enqueued_at) * 1000
+                self.queue_delays[priority].observe(delay_ms)
+                self.queue_latency[priority].record(delay_ms)
+
+            count = min(len(request.crops) - request.next, limit - taken)
+            items.append((request, request.next, request.next + count))
+            request.next += count
+            taken += count
+            if request.next == len(request.crops):
+                queue.popleft()
+
+        self._pending[priority] -= taken
+        return taken
+
+    def _take_batch(self, items):
+        """Chọn khuôn mặt cho lô tiếp theo, ưu tiên live; gọi khi giữ lock"""
+        capacity = self.max_batch_size
+
+        live_limit = capacity
+        if self._queues[UPLOAD]:
+            live_limit = capacity - self.upload_slots
+
+        taken = self._take(LIVE, live_limit, items)
+        taken += self._take(UPLOAD, capacity - taken, items)
+        # Upload không dùng hết phần dành riêng thì nhường lại cho live
+        self._take(LIVE, capacity - taken, items)
+
+    def _run_batch(self, items):
+        total = 0
+        for request, start, end in items:
+            self._batch[total : total + end - start, 0] = request.crops[start:end]
+            total += end - start
+        batch = self._batch[:total]
+        np.divide(batch, np.float32(255.0), out=batch)
+
+        outputs = self.backend.infer(batch)
+        self.batches += 1
+        self.batch_sizes.observe(total)
+
+        offset = 0
+        for request, start, end in items:
+            request.outputs[start:end] = outputs[offset : offset + end - start]
+            offset += end - start
+            request.remaining -= end - start
+            if request.remaining == 0 and not request.future.done():
+                request.future.set_result(request.outputs)
+
+    def _run(self, backend, max_batch_size, upload_share):
+        try:
+            self._setup(backend, max_batch_size, upload_share)
+        except Exception as e:
+            self._startup_error = e
+            return
+        finally:
+            self._ready.set()
+
+        while True:
+            items = []
+            try:
+                with self._condition:
+                    if not self._wait_for_batch():
+                        return
+                    self._take_batch(items)
+                self._run_batch(items)
+            except Exception as e:
+                # Lỗi chỉ làm hỏng các yêu cầu trong lô này, luồng vẫn chạy
+                # tiếp để các Future khác không bị treo
+                for request, _, _ in items:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def stats(self):
+        """
+        Returns:
+            Dict gồm số lô đã chạy, phân bố kích thước lô và thời gian chờ
+            trong hàng đợi (ms) của từng loại yêu cầu
+        """
+        with self._condition:
+            pending = dict(self._pending)
+
+        return {
+            "batches": self.batches,
+            "max_batch_size": self.max_batch_size,
+            "pending": pending,
+            "batch_size": self.batch_sizes.summary(),
+            "queue_delay_ms": {
+                priority: {
+                    **self.queue_latency[priority].summary(),
+                    "histogram": self.queue_delays[priority].summary()["buckets"],
+                }
+                for priority in PRIORITIES
+            },
+        }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    InferenceScheduler dùng chung trong tiến trình, tạo ở lần gọi đầu tiên
+
+    Returns:
+        None nếu tắt INFERENCE_SCHEDULER
+    """
+    global _scheduler
+    if not INFERENCE_SCHEDULER:
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = InferenceScheduler()
+    return _scheduler
@@ -0,0 +1,266 @@
+import contextlib
+import json
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from config import (
+    JOBS_DB_PATH,
+    JOB_WORKERS,
+    JOB_POLL_INTERVAL,
+    JOB_HEARTBEAT_INTERVAL,
+    JOB_STALE_AFTER,
+)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Hàng đợi công việc chạy nền, lưu trong một file SQLite cục bộ
+
+    Các worker là luồng nền, lần lượt nhận công việc đang chờ và gọi
+    handler(job, report_progress). Vì hàng đợi nằm trên đĩa nên công việc
+    không mất khi server khởi động lại. Job đang chạy được ghi worker_id và
+    heartbeat định kỳ; job quá JOB_STALE_AFTER giây không có heartbeat (worker
+    đã chết) được worker khác nhận lại, còn job của tiến trình khác đang chạy
+    thì không bị đụng tới.
+    """
+
+    def __init__(
+        self,
+        handler,
+        db_path=JOBS_DB_PATH,
+        num_workers=JOB_WORKERS,
+        poll_interval=JOB_POLL_INTERVAL,
+        heartbeat_interval=JOB_HEARTBEAT_INTERVAL,
+        stale_after=JOB_STALE_AFTER,
+    ):
+        self.handler = handler
+        self.db_path = db_path
+        self.num_workers = max(1, num_workers)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        # Định danh của hàng đợi trong tiến trình này, ghi vào job đã nhận
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._wakeup = threading.Condition()
+        self._workers = []
+        self._workers_lock = threading.Lock()
+        # Các job đang chạy trong tiến trình này, cần gửi heartbeat
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    worker_id TEXT,
+                    heartbeat_at REAL
+                )
+                """)
+            # File hàng đợi tạo trước khi có heartbeat
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, definition in (("worker_id", "TEXT"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_jobs_status_created "
+                "ON jobs (status, created_at)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def start(self):
+        """
+        Khởi động các luồng worker (gọi nhiều lần không sao)
+        """
+        # enqueue chạy song song trong threadpool nên phải khóa
+        with self._workers_lock:
+            if self._workers:
+                return
+
+            for i in range(self.num_workers):
+                worker = threading.Thread(
+                    target=self._worker_loop, name=f"job-worker-{i}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+            heartbeat = threading.Thread(
+                target=self._heartbeat_loop, name="job-heartbeat", daemon=True
+            )
+            heartbeat.start()
+            self._workers.append(heartbeat)
+
+    def stop(self):
+        self._stopped.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def enqueue(self, user_id, payload):
+        """
+        Thêm công việc mới vào hàng đợi
+
+        Returns:
+            Thông tin job vừa tạo
+        """
+        job_id = str(uuid.uuid4())
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, status, progress, payload, "
+                "created_at, updated_at) VALUES (?, ?, ?, 0, ?, ?, ?)",
+                (job_id, user_id, JOB_QUEUED, json.dumps(payload), now, now),
+            )
+
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def _update(self, job_id, **fields):
+        """
+        Cập nhật job do tiến trình này nhận; job đã bị worker khác nhận lại
+        (vì heartbeat trễ) thì không ghi đè
+        """
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ? AND worker_id = ?",
+                (*fields.values(), job_id, self.worker_id),
+            )
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            with self._running_lock:
+                job_ids = list(self._running)
+            if not job_ids:
+                continue
+
+            now = time.time()
+            with self._connect() as conn:
+                conn.executemany(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker_id = ?",
+                    [(now, job_id, self.worker_id) for job_id in job_ids],
+                )
+
+    def _claim_next(self):
+        """
+        Nhận job chờ lâu nhất, hoặc job đang chạy đã mất heartbeat; UPDATE có
+        điều kiện để hai worker (kể cả ở tiến trình khác) không nhận trùng
+        một job
+        """
+        claimable = "(status = ? OR (status = ? AND COALESCE(heartbeat_at, 0) < ?))"
+
+        with self._connect() as conn:
+            while True:
+                now = time.time()
+                params = (JOB_QUEUED, JOB_RUNNING, now - self.stale_after)
+                row = conn.execute(
+                    f"SELECT id FROM jobs WHERE {claimable} "
+                    "ORDER BY created_at LIMIT 1",
+                    params,
+                ).fetchone()
+                if row is None:
+                    return None
+
+                claimed = conn.execute(
+                    "UPDATE jobs SET status = ?, progress = 0, worker_id = ?, "
+                    f"heartbeat_at = ?, updated_at = ? WHERE id = ? AND {claimable}",
+                    (JOB_RUNNING, self.worker_id, now, now, row["id"], *params),
+                ).rowcount
+                if claimed:
+                    job = conn.execute(
+                        "SELECT * FROM jobs WHERE id = ?", (row["id"],)
+                    ).fetchone()
+                    return self._to_dict(job)
+
+    def _worker_loop(self):
+        while not self._stopped.is_set():
+            job = self._claim_next()
+
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            with self._running_lock:
+                self._running.add(job["id"])
+            try:
+                self._run(job)
+            finally:
+                with self._running_lock:
+                    self._running.discard(job["id"])
+
+    def _run(self, job):
+        last_report = {"progress": 0.0, "time": 0.0}
+
+        def report_progress(fraction):
+            # Chỉ ghi xuống đĩa khi tiến độ tăng đáng kể
+            progress = round(min(max(fraction, 0.0), 1.0) * 100, 1)
+            now = time.time()
+            if progress - last_report["progress"] < 1 and now - last_report["time"] < 1:
+                return
+            last_report.update(progress=progress, time=now)
+            self._update(job["id"], progress=progress)
+
+        try:
+            result = self.handler(job, report_progress)
+        except Exception as e:
+            self._update(job["id"], status=JOB_FAILED, error=str(e))
+            return
+
+        self._update(
+            job["id"],
+            status=JOB_DONE,
+            progress=100.0,
+            result=json.dumps(result),
+        )
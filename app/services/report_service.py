@@ -0,0 +1,234 @@
+import math
+from datetime import date, datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from models.video import SessionData, EmotionReport
+
+# Cảm xúc được thống kê trong báo cáo: cột đếm -> cột phần trăm
+REPORT_EMOTIONS = {
+    "happy": ("happy_count", "happy_percentage"),
+    "sad": ("sad_count", "sad_percentage"),
+    "angry": ("angry_count", "angry_percentage"),
+    "surprise": ("surprise_count", "surprised_percentage"),
+    "neutral": ("neutral_count", "neutral_percentage"),
+}
+
+# Các cột tích lũy của EmotionReport
+COUNTER_COLUMNS = [
+    "total_sessions",
+    "total_duration_minutes",
+    *(count_column for count_column, _ in REPORT_EMOTIONS.values()),
+    "focus_score_sum",
+    "focus_score_count",
+    "engagement_score_sum",
+    "engagement_score_count",
+]
+
+
+def report_day(value):
+    """
+    Thời điểm 00:00 của ngày báo cáo chứa value (date hoặc datetime)
+    """
+    if isinstance(value, datetime):
+        value = value.date()
+    return datetime.combine(value, datetime.min.time())
+
+
+def empty_counters():
+    return {column: 0 for column in COUNTER_COLUMNS}
+
+
+def add_session(counters, session: SessionData):
+    """
+    Cộng một phiên đã kết thúc vào các tổng tích lũy
+    """
+    counters["total_sessions"] += 1
+    counters["total_duration_minutes"] += session.duration_minutes or 0
+
+    if session.dominant_emotion in REPORT_EMOTIONS:
+        count_column, _ = REPORT_EMOTIONS[session.dominant_emotion]
+        counters[count_column] += 1
+
+    if session.focus_score is not None:
+        counters["focus_score_sum"] += session.focus_score
+        counters["focus_score_count"] += 1
+    if session.engagement_score is not None:
+        counters["engagement_score_sum"] += session.engagement_score
+        counters["engagement_score_count"] += 1
+
+
+def get_counters(report: EmotionReport):
+    return {column: getattr(report, column) or 0 for column in COUNTER_COLUMNS}
+
+
+def set_counters(report: EmotionReport, counters):
+    """
+    Ghi các tổng tích lũy vào báo cáo và tính lại phần trăm, trung bình
+    """
+    for column, value in counters.items():
+        setattr(report, column, value)
+
+    total_sessions = counters["total_sessions"]
+    for count_column, percentage_column in REPORT_EMOTIONS.values():
+        percentage = (
+            counters[count_column] / total_sessions * 100 if total_sessions > 0 else 0
+        )
+        setattr(report, percentage_column, percentage)
+
+    report.focused_percentage = (
+        counters["focus_score_sum"] / counters["focus_score_count"]
+        if counters["focus_score_count"]
+        else 0
+    )
+    report.average_engagement = (
+        counters["engagement_score_sum"] / counters["engagement_score_count"]
+        if counters["engagement_score_count"]
+        else 0
+    )
+
+
+def get_report(db: Session, user_id: int, day, lock=False):
+    query = db.query(EmotionReport).filter(
+        EmotionReport.user_id == user_id, EmotionReport.report_date == report_day(day)
+    )
+    if lock:
+        # Hai phiên kết thúc cùng lúc không ghi đè tổng của nhau
+        query = query.with_for_update()
+    return query.first()
+
+
+def create_report(db: Session, user_id: int, day):
+    """
+    Tạo báo cáo rỗng cho ngày chưa có báo cáo
+
+    Hai request cùng tạo báo cáo của một ngày thì request sau vi phạm ràng
+    buộc duy nhất; khi đó chỉ hủy savepoint và dùng báo cáo đã có.
+
+    Returns:
+        (báo cáo, True nếu vừa tạo)
+    """
+    report = EmotionReport(user_id=user_id, report_date=report_day(day))
+    try:
+        with db.begin_nested():
+            db.add(report)
+    except IntegrityError:
+        return get_report(db, user_id, day, lock=True), False
+    return report, True
+
+
+def fold_session(db: Session, session: SessionData):
+    """
+    Cộng phiên vừa kết thúc vào báo cáo của ngày bắt đầu phiên, O(1) thay vì
+    tính lại cả ngày. Không commit, để chung transaction với người gọi.
+    """
+    report = get_report(db, session.user_id, session.start_time, lock=True)
+    created = report is None
+    if created:
+        report, created = create_report(db, session.user_id, session.start_time)
+
+    counters = empty_counters() if created else get_counters(report)
+
+    add_session(counters, session)
+    set_counters(report, counters)
+
+    return report
+
+
+def finished_sessions(db: Session, user_id: int, day):
+    """
+    Các phiên đã kết thúc của người dùng bắt đầu trong ngày day
+    """
+    start_datetime = report_day(day)
+    return (
+        db.query(SessionData)
+        .filter(
+            SessionData.user_id == user_id,
+            SessionData.start_time >= start_datetime,
+            SessionData.start_time < start_datetime + timedelta(days=1),
+            SessionData.end_time.isnot(None),
+        )
+        .all()
+    )
+
+
+def rebuild_report(db: Session, user_id: int, day):
+    """
+    Tính lại báo cáo của một ngày từ đầu dựa trên các phiên đã kết thúc.
+    Không commit.
+
+    Returns:
+        (báo cáo hoặc None nếu ngày không có phiên và chưa có báo cáo,
+        tổng tích lũy trước khi tính lại)
+    """
+    sessions = finished_sessions(db, user_id, day)
+    report = get_report(db, user_id, day, lock=True)
+
+    if report is None:
+        if not sessions:
+            return None, empty_counters()
+        report, created = create_report(db, user_id, day)
+        previous = empty_counters() if created else get_counters(report)
+    else:
+        previous = get_counters(report)
+
+    counters = empty_counters()
+    for session in sessions:
+        add_session(counters, session)
+
+    set_counters(report, counters)
+    return report, previous
+
+
+def counters_match(a, b):
+    """
+    So sánh hai bộ tổng tích lũy, các tổng số thực cho phép sai số làm tròn
+    """
+    return all(math.isclose(a[column], b[column], abs_tol=1e-6) for column in a)
+
+
+def rebuild_reports(
+    db: Session, start_date: date = None, end_date: date = None, user_id=None
+):
+    """
+    Tính lại các báo cáo trong khoảng ngày [start_date, end_date] (None: không
+    giới hạn) và so với giá trị cộng dồn đang lưu. Không commit.
+
+    Returns:
+        List các (user_id, ngày, tổng cũ, tổng mới) của báo cáo bị lệch
+    """
+    # Các cặp (người dùng, ngày) có phiên hoặc báo cáo trong khoảng
+    session_query = db.query(SessionData.user_id, SessionData.start_time).filter(
+        SessionData.end_time.isnot(None)
+    )
+    report_query = db.query(EmotionReport.user_id, EmotionReport.report_date)
+
+    if start_date is not None:
+        start_datetime = report_day(start_date)
+        session_query = session_query.filter(SessionData.start_time >= start_datetime)
+        report_query = report_query.filter(EmotionReport.report_date >= start_datetime)
+    if end_date is not None:
+        end_datetime = report_day(end_date) + timedelta(days=1)
+        session_query = session_query.filter(SessionData.start_time < end_datetime)
+        report_query = report_query.filter(EmotionReport.report_date < end_datetime)
+    if user_id is not None:
+        session_query = session_query.filter(SessionData.user_id == user_id)
+        report_query = report_query.filter(EmotionReport.user_id == user_id)
+
+    keys = {
+        (row_user_id, report_day(moment))
+        for row_user_id, moment in session_query.union_all(report_query)
+    }
+
+    mismatches = []
+    for key_user_id, day in sorted(keys):
+        report, previous = rebuild_report(db, key_user_id, day)
+        current = get_counters(report)
+        if not counters_match(previous, current):
+            mismatches.append((key_user_id, day.date(), previous, current))
+
+    return mismatches
@@ -0,0 +1,147 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from config import BATCH_WINDOW, PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE
+
+# Đánh dấu giai đoạn giải mã đã đọc hết video
+_END_OF_STREAM = object()
+
+
+class VideoPipeline:
+    """
+    Xử lý video theo các giai đoạn chạy song song:
+
+    1. Một luồng giải mã các khung hình được lấy mẫu
+    2. Một pool luồng chạy detectMultiScale và tiền xử lý (OpenCV nhả GIL)
+    3. Luồng gọi run() gom khuôn mặt thành lô và suy luận
+
+    Hàng đợi giữa giai đoạn 1 và 3 có giới hạn nên luồng giải mã sẽ dừng chờ
+    khi phía sau xử lý không kịp, bộ nhớ không tăng theo độ dài video. Các
+    khung hình được lấy ra theo đúng thứ tự giải mã nên kết quả giữ nguyên
+    thứ tự thời gian.
+    """
+
+    def __init__(
+        self,
+        detector,
+        num_workers=PIPELINE_WORKERS,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        batch_window=BATCH_WINDOW,
+    ):
+        self.detector = detector
+        self.num_workers = max(1, num_workers)
+        self.queue_size = max(1, queue_size)
+        self.batch_window = max(1, batch_window)
+
+    def run(
+        self,
+        sampled_frames,
+        fps,
+        tracker=None,
+        detection_params=None,
+        progress_callback=None,
+        reuse=None,
+    ):
+        """
+        Chạy pipeline trên các khung hình lấy mẫu của một video
+
+        Args:
+            sampled_frames: Iterator (frame_idx, frame), ví dụ iter_sampled_frames;
+                được duyệt trong luồng giải mã
+            fps: Số khung hình mỗi giây của video
+            progress_callback: Hàm nhận timestamp (giây) của mẫu cuối cùng đã
+                xử lý xong sau mỗi lô
+            reuse: CropReuse của video (xem EmotionDetector.infer_preprocessed)
+
+        Khi có tracker, trạng thái theo dõi phụ thuộc vào khung hình trước nên
+        giai đoạn nhận diện chỉ dùng một luồng để chạy đúng thứ tự; ba giai
+        đoạn vẫn chạy chồng lên nhau.
+
+        Returns:
+            List kết quả nhận diện cảm xúc, sắp xếp theo timestamp
+        """
+        results = []
+        frames = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        # Các khung hình đã tiền xử lý đang chờ suy luận chung một lô
+        pending_times = []
+        pending_preprocessed = []
+
+        def decode():
+            # Giai đoạn giải mã: đọc frame lấy mẫu và giao cho pool tiền xử lý
+            try:
+                for frame_idx, frame in sampled_frames:
+                    if stop.is_set():
+                        return
+                    future = pool.submit(
+                        self.detector.preprocess_frame,
+                        frame,
+                        tracker,
+                        detection_params,
+                    )
+                    # Chờ khi hàng đợi đầy (backpressure)
+                    frames.put((frame_idx / fps, future))
+            except Exception as e:
+                frames.put(e)
+                return
+
+            frames.put(_END_OF_STREAM)
+
+        def flush_pending():
+            batch_results = self.detector.infer_preprocessed(
+                pending_preprocessed, reuse=reuse
+            )
+
+            for current_time, emotion_results in zip(pending_times, batch_results):
+                for result in emotion_results:
+                    result["timestamp"] = current_time
+                results.extend(emotion_results)
+
+            if progress_callback is not None:
+                progress_callback(pending_times[-1])
+
+            pending_times.clear()
+            pending_preprocessed.clear()
+
+        num_workers = 1 if tracker is not None else self.num_workers
+
+        with ThreadPoolExecutor(
+            max_workers=num_workers, thread_name_prefix="face-detect"
+        ) as pool:
+            decoder = threading.Thread(target=decode, name="video-decode", daemon=True)
+            decoder.start()
+
+            try:
+                while True:
+                    item = frames.get()
+                    if item is _END_OF_STREAM:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+
+                    current_time, future = item
+                    pending_times.append(current_time)
+                    pending_preprocessed.append(future.result())
+
+                    if len(pending_preprocessed) >= self.batch_window:
+                        flush_pending()
+
+                if pending_preprocessed:
+                    flush_pending()
+            finally:
+                # Dừng luồng giải mã nếu có lỗi và giải phóng hàng đợi để nó thoát
+                stop.set()
+                while decoder.is_alive():
+                    try:
+                        frames.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+                decoder.join()
+
+        return results
@@ -1,100 +1,619 @@
 import os
+import re
+import math
 import uuid
 import cv2
+import numpy as np
 import json
+import hashlib
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from fastapi import UploadFile, HTTPException
+from fastapi import UploadFile, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 
 # from ..models.video import Video, EmotionData
 # from ..services.emotion_detector import EmotionDetector
 # from ..config import UPLOAD_FOLDER
 
-from ...app.models.video import Video, EmotionData
+from ...app.models.video import Video, EmotionData, ProcessedVideo
 from app.services.emotion_detector import EmotionDetector
-from app.config import UPLOAD_FOLDER
+from app.services.inference_scheduler import get_scheduler
+from app.services.video_sharding import process_video_sharded
+from app.services.job_queue import JobQueue
+from app.services.emotion_storage import bulk_insert_emotions, copy_emotions
+from app.services.emotion_timeline import EmotionTimeline, EMOTION_INDEX
+from app.database import SessionLocal
+from app.config import (
+    UPLOAD_FOLDER,
+    VIDEO_SHARDING,
+    SHARD_MIN_DURATION,
+    MAX_UPLOAD_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    EMOTION_STORAGE,
+    ANALYSIS_CACHE_SIZE,
+    ANALYSIS_CACHE_TTL,
+    DEFAULT_PAGE_SIZE,
+    EMOTION_LABELS,
+    TIMELINE_DEFAULT_BUCKET,
+    TIMELINE_MAX_POINTS,
+    TIMELINE_CACHE_SIZE,
+    VIDEO_DEDUP,
+    MODEL_VERSION,
+    INFERENCE_BACKEND,
+    MODEL_INPUT_SIZE,
+    FACE_TRACKING,
+    TRACKING_DETECT_EVERY,
+    CROP_REUSE,
+    CROP_REUSE_THRESHOLD,
+    CROP_REUSE_MAX_REUSE,
+    ADAPTIVE_SAMPLING,
+    ADAPTIVE_MIN_INTERVAL,
+    ADAPTIVE_MAX_INTERVAL,
+    ADAPTIVE_MOTION_THRESHOLD,
+)
+from app.utils.cache import TTLCache
+from app.utils.pagination import (
+    encode_cursor,
+    decode_cursor,
+    keyset_query,
+    paginate,
+    ndjson_response,
+    stream_query,
+)
+
+
+def sniff_video_container(header: bytes):
+    """
+    Nhận dạng định dạng video từ các byte đầu file, không dựa vào phần mở rộng
+
+    Returns:
+        Tên container (mp4, avi, mkv) hoặc None nếu không phải video hỗ trợ
+    """
+    # MP4/MOV: box đầu tiên là ftyp (QuickTime cũ có thể bắt đầu bằng moov, mdat...)
+    if header[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+        return "mp4"
+    # AVI: RIFF....AVI
+    if header[:4] == b"RIFF" and header[8:12] == b"AVI ":
+        return "avi"
+    # MKV/WebM: EBML header
+    if header[:4] == b"\x1a\x45\xdf\xa3":
+        return "mkv"
+    return None
+
+
+BUCKET_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# Khoảng thời gian (giây) giữa các lần nhận diện khi xử lý video tải lên
+SAMPLE_INTERVAL = 1.0
+
+
+def processing_key(detection_params):
+    """
+    Khóa của các thiết lập ảnh hưởng tới kết quả xử lý video (model, tham số
+    lấy mẫu và nhận diện). Video trùng nội dung chỉ dùng lại kết quả cũ khi
+    khóa giống nhau.
+    """
+    settings = {
+        "backend": INFERENCE_BACKEND,
+        "model_version": MODEL_VERSION,
+        "input_size": list(MODEL_INPUT_SIZE),
+        "interval": SAMPLE_INTERVAL,
+        "adaptive": (
+            [ADAPTIVE_MIN_INTERVAL, ADAPTIVE_MAX_INTERVAL, ADAPTIVE_MOTION_THRESHOLD]
+            if ADAPTIVE_SAMPLING
+            else None
+        ),
+        "detection_params": detection_params,
+        "tracking": TRACKING_DETECT_EVERY if FACE_TRACKING else None,
+        "crop_reuse": (
+            [CROP_REUSE_THRESHOLD, CROP_REUSE_MAX_REUSE] if CROP_REUSE else None
+        ),
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+def parse_bucket(value: str):
+    """
+    Đọc độ dài khoảng thời gian dạng "500ms", "10s", "1m", "1h" (không có đơn
+    vị là giây)
+
+    Returns:
+        Số giây, làm tròn tới mili giây
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*", value)
+    seconds = 0
+    if match:
+        seconds = round(float(match.group(1)) * BUCKET_UNITS[match.group(2) or "s"], 3)
+    if seconds <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bucket không hợp lệ (ví dụ: 500ms, 10s, 1m)",
+        )
+    return seconds
+
+
+def nice_bucket(seconds: float):
+    """
+    Làm tròn lên thành 1, 2 hoặc 5 x 10^k giây (tối thiểu 1 ms) để các
+    max_points gần nhau dùng chung kết quả trong cache
+    """
+    seconds = max(seconds, 0.001)
+    magnitude = 10 ** math.floor(math.log10(seconds))
+    for step in (1, 2, 5, 10):
+        if step * magnitude >= seconds * (1 - 1e-9):
+            return round(step * magnitude, 3)
+
+
+def _write_chunk(buffer, digest, chunk):
+    buffer.write(chunk)
+    digest.update(chunk)
 
 
 class VideoService:
     def __init__(self):
         # Đảm bảo thư mục upload tồn tại
         os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        self.emotion_detector = EmotionDetector()
+        # Dùng chung bộ lập lịch suy luận với camera trực tiếp (nếu bật)
+        self.emotion_detector = EmotionDetector(scheduler=get_scheduler())
+        # Hàng đợi xử lý video chạy nền
+        self.job_queue = JobQueue(self.run_job)
+        # Chạy ngay các job còn chờ từ lần chạy trước, không đợi upload mới
+        self.job_queue.start()
+        # Kết quả phân tích theo video_id, dashboard gọi lại liên tục
+        self.analysis_cache = TTLCache(ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL)
+        # Timeline gom theo khoảng, key (video_id, độ dài khoảng)
+        self.timeline_cache = TTLCache(TIMELINE_CACHE_SIZE, ANALYSIS_CACHE_TTL)
+
+    def process_video(self, file_path: str, progress_callback=None):
+        """
+        Nhận diện cảm xúc cho video, video dài được chia cho nhiều tiến trình
+        """
+        # Lấy mẫu thích ứng không chia đoạn được (xem plan_shards), chạy tại chỗ
+        if VIDEO_SHARDING and not ADAPTIVE_SAMPLING:
+            cap = cv2.VideoCapture(file_path)
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+            cap.release()
+
+            if fps > 0 and frame_count / fps >= SHARD_MIN_DURATION:
+                return process_video_sharded(
+                    file_path, SAMPLE_INTERVAL, progress_callback=progress_callback
+                )
 
-    async def save_video(self, file: UploadFile, user_id: int, db: Session):
+        return self.emotion_detector.process_video(
+            file_path, SAMPLE_INTERVAL, progress_callback=progress_callback
+        )
+
+    async def save_upload(self, file: UploadFile):
         """
-        Lưu video đã tải lên, xử lý nhận diện cảm xúc và lưu kết quả vào database
+        Ghi file tải lên xuống thư mục upload theo từng khối, không nạp cả file
+        vào bộ nhớ. Việc ghi đĩa và tính SHA-256 chạy trong threadpool.
+
+        Returns:
+            (tên file, đường dẫn file, SHA-256 dạng hex, số byte)
         """
+        # Từ chối sớm nếu đã biết kích thước
+        if file.size is not None and file.size > MAX_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Video vượt quá dung lượng cho phép",
+            )
+
         # Tạo tên tệp duy nhất
         file_extension = os.path.splitext(file.filename)[1]
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
 
-        # Lưu file tải lên
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(file_path, "wb") as buffer:
+                while True:
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+
+                    # Kiểm tra nội dung ngay ở khối đầu tiên
+                    if size == 0 and sniff_video_container(chunk) is None:
+                        raise HTTPException(
+                            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="File tải lên không phải video hợp lệ",
+                        )
+
+                    size += len(chunk)
+                    if size > MAX_UPLOAD_SIZE:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail="Video vượt quá dung lượng cho phép",
+                        )
+
+                    await run_in_threadpool(_write_chunk, buffer, digest, chunk)
+
+            if size == 0:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="File tải lên rỗng",
+                )
+        except Exception:
+            # Xóa file ghi dở
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+
+        return unique_filename, file_path, digest.hexdigest(), size
+
+    def store_video(
+        self,
+        file_path: str,
+        filename: str,
+        user_id: int,
+        db: Session,
+        progress_callback=None,
+        content_hash=None,
+    ):
+        """
+        Xử lý nhận diện cảm xúc cho file đã lưu và lưu kết quả vào database
+
+        Args:
+            content_hash: SHA-256 của file; khi đã có video cùng nội dung được
+                xử lý với cùng thiết lập, dùng lại kết quả và không xử lý lại
+        """
+        key = processing_key(self.emotion_detector.detection_params)
+        if VIDEO_DEDUP and content_hash:
+            processed = (
+                db.query(ProcessedVideo)
+                .filter(
+                    ProcessedVideo.content_hash == content_hash,
+                    ProcessedVideo.processing_key == key,
+                )
+                .first()
+            )
+            if processed is not None:
+                db_video = self._store_duplicate(
+                    processed, file_path, user_id, content_hash, db
+                )
+                if db_video is not None:
+                    return db_video
 
         try:
             # Xử lý video để nhận diện cảm xúc
-            emotion_results, duration = self.emotion_detector.process_video(file_path)
+            emotion_results, duration = self.process_video(file_path, progress_callback)
+
+            # Lưu timeline dạng cột cạnh file video
+            timeline_path = None
+            if EMOTION_STORAGE in ("timeline", "both"):
+                timeline_path = EmotionTimeline.path_for(file_path)
+                EmotionTimeline.from_results(emotion_results).save(timeline_path)
 
             # Lưu thông tin video vào database
             db_video = Video(
                 user_id=user_id,
-                filename=unique_filename,
+                filename=filename,
                 filepath=file_path,
                 duration=duration,
+                timeline_path=timeline_path,
+                content_hash=content_hash,
             )
             db.add(db_video)
-            db.commit()
-            db.refresh(db_video)
+            # Lấy id của video, commit chung một lần với dữ liệu cảm xúc
+            db.flush()
 
             # Lưu kết quả nhận diện cảm xúc vào database
-            for result in emotion_results:
-                # Chuyển đổi tọa độ khuôn mặt sang chuỗi JSON
-                face_coordinates = json.dumps(result["face_coordinates"])
-
-                db_emotion = EmotionData(
-                    video_id=db_video.id,
-                    timestamp=result["timestamp"],
-                    emotion=result["emotion"],
-                    confidence=result["confidence"],
-                    face_coordinates=face_coordinates,
+            if EMOTION_STORAGE in ("rows", "both"):
+                bulk_insert_emotions(db, db_video.id, emotion_results)
+
+            # Kết quả nhận diện không đổi sau khi xử lý nên tính phân tích luôn
+            emotion_counts = Counter(result["emotion"] for result in emotion_results)
+            if emotion_counts:
+                analysis = self.summarize_emotions(db_video.id, emotion_counts)
+                # Số lần suy luận được bỏ qua nhờ dùng lại kết quả (CROP_REUSE)
+                analysis["inferences_saved"] = sum(
+                    1 for result in emotion_results if result.get("reused")
                 )
-                db.add(db_emotion)
+                db_video.analysis = json.dumps(analysis)
+
+            if VIDEO_DEDUP and content_hash:
+                self._register_processed(db_video, key, db)
 
             db.commit()
+            db.refresh(db_video)
+            # id có thể được dùng lại sau khi xóa video, bỏ kết quả cũ trong cache
+            self.invalidate_video_cache(db_video.id)
 
             return db_video
 
-        except Exception as e:
+        except Exception:
+            db.rollback()
             # Nếu có lỗi, xóa file đã tải lên
             if os.path.exists(file_path):
                 os.remove(file_path)
-            raise HTTPException(
-                status_code=500, detail=f"Lỗi khi xử lý video: {str(e)}"
+            EmotionTimeline.delete(EmotionTimeline.path_for(file_path))
+            raise
+
+    def _register_processed(self, db_video: Video, key: str, db: Session):
+        """
+        Ghi kết quả của video vừa xử lý vào chỉ mục nội dung để các lần tải
+        lên trùng nội dung dùng lại
+        """
+        processed = ProcessedVideo(
+            content_hash=db_video.content_hash,
+            processing_key=key,
+            filepath=db_video.filepath,
+            timeline_path=db_video.timeline_path,
+            duration=db_video.duration,
+            analysis=db_video.analysis,
+            ref_count=1,
+        )
+        try:
+            with db.begin_nested():
+                db.add(processed)
+                db.flush()
+        except IntegrityError:
+            # Video cùng nội dung được xử lý đồng thời và đã ghi trước, video
+            # này giữ file riêng
+            return
+        db_video.processed_video_id = processed.id
+
+    def _store_duplicate(
+        self,
+        processed: ProcessedVideo,
+        file_path: str,
+        user_id: int,
+        content_hash: str,
+        db: Session,
+    ):
+        """
+        Tạo video trỏ tới file và kết quả đã xử lý của video cùng nội dung,
+        không giải mã hay suy luận lại; file vừa tải lên bị xóa
+
+        Returns:
+            Video mới, None nếu kết quả vừa bị xóa cùng video cuối cùng dùng nó
+        """
+        try:
+            # Tăng số tham chiếu trước, không dùng kết quả đã về 0 (đang bị xóa)
+            claimed = (
+                db.query(ProcessedVideo)
+                .filter(ProcessedVideo.id == processed.id, ProcessedVideo.ref_count > 0)
+                .update(
+                    {ProcessedVideo.ref_count: ProcessedVideo.ref_count + 1},
+                    synchronize_session=False,
+                )
             )
+            if not claimed:
+                db.rollback()
+                return None
 
-    def analyze_video_emotions(self, video_id: int, db: Session):
+            db_video = Video(
+                user_id=user_id,
+                filename=os.path.basename(processed.filepath),
+                filepath=processed.filepath,
+                duration=processed.duration,
+                timeline_path=processed.timeline_path,
+                content_hash=content_hash,
+                processed_video_id=processed.id,
+            )
+            db.add(db_video)
+            db.flush()
+
+            # Dữ liệu cảm xúc dạng dòng thuộc từng video, sao chép từ một video
+            # khác đang dùng chung kết quả
+            if EMOTION_STORAGE in ("rows", "both"):
+                source = (
+                    db.query(Video.id)
+                    .filter(
+                        Video.processed_video_id == processed.id,
+                        Video.id != db_video.id,
+                    )
+                    .first()
+                )
+                if source is not None:
+                    copy_emotions(db, source.id, db_video.id)
+
+            if processed.analysis:
+                analysis = json.loads(processed.analysis)
+                analysis["video_id"] = db_video.id
+                db_video.analysis = json.dumps(analysis)
+
+            db.commit()
+            db.refresh(db_video)
+            self.invalidate_video_cache(db_video.id)
+        except Exception:
+            db.rollback()
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return db_video
+
+    async def enqueue_video(self, file: UploadFile, user_id: int):
         """
-        Phân tích thống kê cảm xúc từ video đã xử lý
+        Lưu video đã tải lên và đưa vào hàng đợi xử lý nền
+
+        Returns:
+            Thông tin công việc (xem get_job)
         """
-        # Lấy tất cả dữ liệu cảm xúc của video
-        emotion_data = (
-            db.query(EmotionData).filter(EmotionData.video_id == video_id).all()
+        unique_filename, file_path, content_hash, size = await self.save_upload(file)
+
+        # Hàng đợi ghi SQLite đồng bộ, không chạy trên event loop
+        job = await run_in_threadpool(
+            self.job_queue.enqueue,
+            user_id,
+            {
+                "filename": unique_filename,
+                "filepath": file_path,
+                "sha256": content_hash,
+                "size": size,
+            },
         )
+        return self._job_to_response(job)
 
-        if not emotion_data:
-            raise HTTPException(
-                status_code=404, detail="Không tìm thấy dữ liệu cảm xúc cho video này"
+    def run_job(self, job, report_progress):
+        """
+        Worker của hàng đợi: xử lý một video đã tải lên
+        """
+        payload = job["payload"]
+        db = SessionLocal()
+        try:
+            db_video = self.store_video(
+                payload["filepath"],
+                payload["filename"],
+                job["user_id"],
+                db,
+                report_progress,
+                payload.get("sha256"),
+            )
+            return {"video_id": db_video.id}
+        finally:
+            db.close()
+
+    @staticmethod
+    def _job_to_response(job):
+        result = job["result"] or {}
+        return {
+            "id": job["id"],
+            "status": job["status"],
+            "progress": job["progress"],
+            "video_id": result.get("video_id"),
+            "error": job["error"],
+            "created_at": datetime.fromtimestamp(job["created_at"]),
+            "updated_at": datetime.fromtimestamp(job["updated_at"]),
+        }
+
+    def get_job(self, job_id: str, user_id: int):
+        """
+        Lấy trạng thái công việc xử lý video của người dùng
+        """
+        job = self.job_queue.get(job_id)
+        if job is None or job["user_id"] != user_id:
+            return None
+        return self._job_to_response(job)
+
+    @staticmethod
+    def load_timeline(video: Video):
+        """
+        Đọc timeline cảm xúc của video, None nếu video không có timeline
+        """
+        if not video.timeline_path or not os.path.isdir(video.timeline_path):
+            return None
+        return EmotionTimeline.load(video.timeline_path)
+
+    @staticmethod
+    def emotion_to_dict(emotion: EmotionData):
+        return {
+            "id": emotion.id,
+            "video_id": emotion.video_id,
+            "timestamp": emotion.timestamp,
+            "emotion": emotion.emotion,
+            "confidence": emotion.confidence,
+            "face_coordinates": json.loads(emotion.face_coordinates or "{}"),
+            "created_at": emotion.created_at,
+        }
+
+    @staticmethod
+    def has_emotion_rows(video: Video, db: Session):
+        return (
+            db.query(EmotionData.id).filter(EmotionData.video_id == video.id).first()
+            is not None
+        )
+
+    def _iter_timeline_rows(self, video: Video, cursor=None, limit=None):
+        """
+        Các dòng dựng lại từ timeline; id là vị trí trong timeline (bắt đầu từ
+        1) nên cursor chỉ cần id của dòng cuối đã trả về
+        """
+        timeline = self.load_timeline(video)
+        if timeline is None:
+            return
+
+        start = decode_cursor(cursor, 1)[0] if cursor else 0
+        stop = start + limit if limit is not None else None
+        for idx, row in enumerate(timeline.iter_rows(start, stop), start):
+            yield {
+                **row,
+                "id": idx + 1,
+                "video_id": video.id,
+                "created_at": video.created_at,
+            }
+
+    def get_video_emotions(
+        self, video: Video, db: Session, cursor=None, limit=DEFAULT_PAGE_SIZE
+    ):
+        """
+        Lấy một trang dữ liệu cảm xúc của video theo thứ tự thời gian; nếu video
+        chỉ lưu timeline thì dựng lại các dòng từ timeline
+
+        Returns:
+            (list các dòng dạng dict, cursor của trang tiếp theo hoặc None)
+        """
+        if self.has_emotion_rows(video, db):
+            emotions, next_cursor = paginate(
+                db.query(EmotionData).filter(EmotionData.video_id == video.id),
+                [EmotionData.timestamp, EmotionData.id],
+                cursor,
+                limit,
+            )
+            return [self.emotion_to_dict(emotion) for emotion in emotions], next_cursor
+
+        # Đọc dư một dòng để biết còn trang sau hay không
+        rows = list(self._iter_timeline_rows(video, cursor, limit + 1))
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1]["id"])
+
+    def stream_video_emotions(self, video: Video, db: Session, cursor=None):
+        """
+        Trả về toàn bộ dữ liệu cảm xúc (từ cursor) dạng NDJSON streaming
+        """
+        if self.has_emotion_rows(video, db):
+            return stream_query(
+                lambda stream_db: keyset_query(
+                    stream_db.query(EmotionData).filter(
+                        EmotionData.video_id == video.id
+                    ),
+                    [EmotionData.timestamp, EmotionData.id],
+                    cursor,
+                ),
+                self.emotion_to_dict,
             )
 
-        # Đếm số lượng từng loại cảm xúc
-        emotion_counts = {}
-        for data in emotion_data:
-            emotion = data.emotion
-            emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
+        if cursor:
+            # Kiểm tra cursor trước khi bắt đầu gửi response
+            decode_cursor(cursor, 1)
+        return ndjson_response(self._iter_timeline_rows(video, cursor), dict)
+
+    def count_video_emotions(self, video: Video, db: Session):
+        """
+        Đếm số lần xuất hiện của từng cảm xúc trong video bằng một truy vấn
+        GROUP BY (dùng index (video_id, emotion)); video chỉ lưu timeline thì
+        đếm trên timeline
+        """
+        emotion_counts = dict(
+            db.query(EmotionData.emotion, func.count(EmotionData.id))
+            .filter(EmotionData.video_id == video.id)
+            .group_by(EmotionData.emotion)
+            .all()
+        )
+        if emotion_counts:
+            return emotion_counts
+
+        timeline = self.load_timeline(video)
+        if timeline is not None:
+            return timeline.emotion_counts()
 
+        return {}
+
+    @staticmethod
+    def summarize_emotions(video_id: int, emotion_counts):
+        """
+        Tính các chỉ số phân tích từ số lần xuất hiện của từng cảm xúc
+        """
         # Tính phần trăm cho từng loại cảm xúc
         total_emotions = sum(emotion_counts.values())
         emotion_percentages = {
@@ -102,14 +621,6 @@ class VideoService:
             for emotion, count in emotion_counts.items()
         }
 
-        # Tính thời gian trung bình cho mỗi cảm xúc
-        emotion_times = {}
-        for data in emotion_data:
-            emotion = data.emotion
-            if emotion not in emotion_times:
-                emotion_times[emotion] = []
-            emotion_times[emotion].append(data.timestamp)
-
         # Cảm xúc chiếm ưu thế
         dominant_emotion = max(emotion_counts.items(), key=lambda x: x[1])[0]
 
@@ -121,14 +632,178 @@ class VideoService:
         # Tính điểm tương tác (engagement score)
         engagement_score = 10 - (emotion_counts.get("neutral", 0) / total_emotions) * 10
 
-        result = {
+        return {
             "video_id": video_id,
             "total_emotions_detected": total_emotions,
-            "emotion_counts": emotion_counts,
+            "emotion_counts": dict(emotion_counts),
             "emotion_percentages": emotion_percentages,
             "dominant_emotion": dominant_emotion,
             "focus_score": focus_score,
             "engagement_score": engagement_score,
         }
 
-        return result
+    def _load_analysis(self, video_id: int, db: Session):
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if video is not None and video.analysis:
+            return json.loads(video.analysis)
+
+        emotion_counts = self.count_video_emotions(video, db) if video else {}
+        if not emotion_counts:
+            raise HTTPException(
+                status_code=404, detail="Không tìm thấy dữ liệu cảm xúc cho video này"
+            )
+
+        # Video xử lý trước khi có cột analysis: tính một lần rồi lưu lại
+        analysis = self.summarize_emotions(video_id, emotion_counts)
+        video.analysis = json.dumps(analysis)
+        db.commit()
+
+        return analysis
+
+    def analyze_video_emotions(self, video_id: int, db: Session):
+        """
+        Phân tích thống kê cảm xúc từ video đã xử lý
+
+        Đọc kết quả đã lưu khi xử lý video, qua cache trong tiến trình; nhiều
+        request cùng miss cho một video chỉ đọc database một lần
+        """
+        return self.analysis_cache.get_or_compute(
+            video_id, lambda: self._load_analysis(video_id, db)
+        )
+
+    def invalidate_video_cache(self, video_id: int):
+        self.analysis_cache.invalidate(video_id)
+        self.timeline_cache.invalidate_matching(lambda key: key[0] == video_id)
+
+    def load_emotion_columns(self, video: Video, db: Session):
+        """
+        Dữ liệu cảm xúc của video dạng cột (EmotionTimeline): đọc timeline nếu
+        có, nếu không thì đọc các cột cần thiết từ emotion_data
+        """
+        timeline = self.load_timeline(video)
+        if timeline is not None:
+            return timeline
+
+        rows = (
+            db.query(EmotionData.timestamp, EmotionData.emotion, EmotionData.confidence)
+            .filter(EmotionData.video_id == video.id)
+            .all()
+        )
+        return EmotionTimeline(
+            np.array([row[0] for row in rows], dtype=np.float64),
+            np.array([EMOTION_INDEX[row[1]] for row in rows], dtype=np.uint8),
+            np.array([row[2] for row in rows], dtype=np.float16),
+            np.zeros((len(rows), 4), dtype=np.int16),
+        )
+
+    def _build_timeline(
+        self, video: Video, db: Session, bucket_seconds: float, num_buckets: int
+    ):
+        columns = self.load_emotion_columns(video, db)
+        if not len(columns):
+            raise HTTPException(
+                status_code=404, detail="Không tìm thấy dữ liệu cảm xúc cho video này"
+            )
+
+        buckets = columns.bucketize(bucket_seconds, num_buckets)
+        face_counts = buckets["face_counts"]
+
+        # Khoảng không có khuôn mặt cho NaN, đổi thành None/0 ở dưới
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_confidence = buckets["confidence_sums"] / face_counts
+            distribution = buckets["emotion_counts"] / face_counts[:, None]
+
+        return {
+            "video_id": video.id,
+            "bucket_seconds": bucket_seconds,
+            "duration": video.duration or 0,
+            "labels": EMOTION_LABELS,
+            "bucket_start": np.round(
+                np.arange(num_buckets) * bucket_seconds, 3
+            ).tolist(),
+            "face_count": face_counts.tolist(),
+            "mean_confidence": [
+                None if math.isnan(value) else value
+                for value in np.round(mean_confidence, 4).tolist()
+            ],
+            "distribution": {
+                label: np.round(np.nan_to_num(distribution[:, idx]), 4).tolist()
+                for idx, label in enumerate(EMOTION_LABELS)
+            },
+        }
+
+    def get_emotion_timeline(
+        self, video: Video, db: Session, bucket: str = None, max_points: int = None
+    ):
+        """
+        Timeline cảm xúc của video gom theo khoảng thời gian: phân bố cảm xúc,
+        độ tin cậy trung bình và số khuôn mặt của mỗi khoảng
+
+        Args:
+            bucket: Độ dài mỗi khoảng (vd: "10s"), mặc định TIMELINE_DEFAULT_BUCKET
+            max_points: Số khoảng tối đa; khoảng được nới rộng (1/2/5 x 10^k
+                giây) nếu cần
+        """
+        duration = video.duration or 0
+        bucket_seconds = parse_bucket(bucket) if bucket else None
+
+        if max_points:
+            min_bucket = nice_bucket(duration / max_points)
+            bucket_seconds = max(bucket_seconds or 0, min_bucket)
+        if bucket_seconds is None:
+            bucket_seconds = TIMELINE_DEFAULT_BUCKET
+
+        num_buckets = max(1, math.ceil(duration / bucket_seconds))
+        if num_buckets > TIMELINE_MAX_POINTS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"bucket quá nhỏ, tối đa {TIMELINE_MAX_POINTS} khoảng",
+            )
+
+        return self.timeline_cache.get_or_compute(
+            (video.id, bucket_seconds),
+            lambda: self._build_timeline(video, db, bucket_seconds, num_buckets),
+        )
+
+    def delete_video(self, video: Video, db: Session):
+        """
+        Xóa video cùng dữ liệu cảm xúc, file video và timeline
+
+        File và timeline dùng chung với video cùng nội dung chỉ bị xóa khi
+        không còn video nào dùng
+        """
+        video_id = video.id
+        file_path = video.filepath
+        timeline_path = video.timeline_path
+        processed_video_id = video.processed_video_id
+
+        # Xóa dữ liệu cảm xúc bằng một câu lệnh thay vì nạp từng dòng để cascade
+        db.query(EmotionData).filter(EmotionData.video_id == video_id).delete(
+            synchronize_session=False
+        )
+        db.delete(video)
+
+        remove_files = True
+        if processed_video_id is not None:
+            processed = (
+                db.query(ProcessedVideo)
+                .filter(ProcessedVideo.id == processed_video_id)
+                .with_for_update()
+                .first()
+            )
+            if processed is not None:
+                processed.ref_count -= 1
+                if processed.ref_count > 0:
+                    remove_files = False
+                else:
+                    db.delete(processed)
+        db.commit()
+
+        self.invalidate_video_cache(video_id)
+
+        if not remove_files:
+            return
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        if timeline_path:
+            EmotionTimeline.delete(timeline_path)
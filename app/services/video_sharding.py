@@ -0,0 +1,173 @@
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from config import (
+    SHARD_WORKERS,
+    SHARD_SEGMENTS_PER_WORKER,
+    INFERENCE_BACKEND,
+    ADAPTIVE_SAMPLING,
+)
+from services.emotion_detector import EmotionDetector
+
+# Detector riêng của mỗi tiến trình worker, tạo một lần trong _init_worker
+_worker_detector = None
+
+# Pool dùng chung giữa các video để không phải nạp lại model cho mỗi video
+_shard_pool = None
+_shard_pool_key = None
+
+
+def _init_worker(backend, detector_kwargs):
+    global _worker_detector
+    _worker_detector = EmotionDetector(backend=backend, **detector_kwargs)
+
+
+def _process_segment(video_path, interval, start_frame, end_frame, options):
+    """
+    Xử lý đoạn [start_frame, end_frame) của video trong tiến trình worker
+    """
+    # Mỗi worker đã là một tiến trình riêng, không chạy thêm pipeline luồng
+    results, _ = _worker_detector.process_video(
+        video_path,
+        interval,
+        pipelined=False,
+        start_frame=start_frame,
+        end_frame=end_frame,
+        **options,
+    )
+    return results
+
+
+def get_shard_pool(num_workers=SHARD_WORKERS, backend=INFERENCE_BACKEND, **kwargs):
+    """
+    Lấy ProcessPoolExecutor dùng chung, tạo lại nếu cấu hình thay đổi
+    """
+    global _shard_pool, _shard_pool_key
+
+    key = (num_workers, backend, tuple(sorted(kwargs.items())))
+    if _shard_pool is None or _shard_pool_key != key:
+        if _shard_pool is not None:
+            _shard_pool.shutdown()
+        _shard_pool = ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_worker,
+            initargs=(backend, kwargs),
+            # Tiến trình con không kế thừa context CUDA hay luồng của cha qua fork
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _shard_pool_key = key
+
+    return _shard_pool
+
+
+def plan_segments(frame_count, frames_per_interval, num_segments):
+    """
+    Chia video thành các đoạn liên tiếp, mỗi đoạn bắt đầu đúng tại một frame
+    lấy mẫu để kết quả trùng với khi chạy tuần tự
+
+    Returns:
+        List các cặp (start_frame, end_frame); đoạn cuối có end_frame=None để
+        đọc tới hết video như khi chạy tuần tự
+    """
+    num_samples = max(1, math.ceil(frame_count / frames_per_interval))
+    num_segments = max(1, min(num_segments, num_samples))
+    samples_per_segment = math.ceil(num_samples / num_segments)
+
+    segments = []
+    for first_sample in range(0, num_samples, samples_per_segment):
+        start_frame = first_sample * frames_per_interval
+        end_frame = (first_sample + samples_per_segment) * frames_per_interval
+        segments.append((start_frame, end_frame))
+
+    segments[-1] = (segments[-1][0], None)
+    return segments
+
+
+def plan_shards(
+    frame_count, frames_per_interval, num_workers, adaptive=ADAPTIVE_SAMPLING
+):
+    """
+    Các đoạn giao cho tiến trình worker
+
+    Lấy mẫu thích ứng so mỗi khung hình với mẫu trước đó nên phụ thuộc vào
+    toàn bộ phần video đứng trước; khi bật thì không chia đoạn để kết quả
+    trùng với khi chạy tuần tự.
+    """
+    num_segments = 1 if adaptive else num_workers * SHARD_SEGMENTS_PER_WORKER
+    return plan_segments(frame_count, frames_per_interval, num_segments)
+
+
+def process_video_sharded(
+    video_path,
+    interval=1.0,
+    num_workers=SHARD_WORKERS,
+    backend=INFERENCE_BACKEND,
+    progress_callback=None,
+    **options,
+):
+    """
+    Xử lý video bằng nhiều tiến trình, mỗi tiến trình một đoạn thời gian
+
+    Args:
+        video_path: Đường dẫn đến file video
+        interval: Khoảng thời gian (giây) giữa các lần nhận diện
+        num_workers: Số tiến trình worker
+        backend: Backend suy luận của các worker
+        progress_callback: Hàm nhận tỉ lệ hoàn thành (0-1) khi xong mỗi đoạn
+        options: Tham số khác của EmotionDetector.process_video (sampling,
+            tracking, detection_params, ...)
+
+    Returns:
+        (kết quả theo thứ tự timestamp, thời lượng video) giống process_video
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Không thể mở file video: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    duration = frame_count / fps
+    frames_per_interval = max(1, int(fps * interval))
+
+    segments = plan_shards(
+        frame_count,
+        frames_per_interval,
+        num_workers,
+        options.get("adaptive", ADAPTIVE_SAMPLING),
+    )
+
+    pool = get_shard_pool(num_workers, backend)
+    futures = [
+        pool.submit(
+            _process_segment, video_path, interval, start_frame, end_frame, options
+        )
+        for start_frame, end_frame in segments
+    ]
+
+    # Các đoạn nối tiếp nhau nên ghép theo thứ tự đoạn là đúng thứ tự thời gian
+    results = []
+    track_id_offset = 0
+    for segment_idx, future in enumerate(futures):
+        segment_results = future.result()
+        if progress_callback is not None:
+            progress_callback((segment_idx + 1) / len(futures))
+
+        # Tracking chạy riêng trong từng đoạn, dời track_id để không trùng
+        max_track_id = 0
+        for result in segment_results:
+            if "track_id" in result:
+                max_track_id = max(max_track_id, result["track_id"])
+                result["track_id"] += track_id_offset
+        track_id_offset += max_track_id
+
+        results.extend(segment_results)
+
+    return results, duration
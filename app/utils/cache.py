@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _InFlight:
+    """Một lần tính đang chạy; các luồng khác chờ event rồi lấy kết quả"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Cache trong tiến trình kết hợp LRU và TTL, an toàn với nhiều luồng
+
+    - Tối đa max_size phần tử, vượt quá thì bỏ phần tử ít dùng nhất
+    - Phần tử hết hạn sau ttl giây (ttl=None: không hết hạn)
+    - get_or_compute chống dồn tải (single-flight): nhiều lần miss đồng thời
+      cho cùng một key chỉ gọi hàm tính một lần, các luồng còn lại dùng chung
+      kết quả hoặc lỗi của lần tính đó
+    """
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        # key -> (giá trị, thời điểm hết hạn)
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        # Tăng mỗi lần invalidate để bỏ kết quả của lần tính bắt đầu trước đó
+        self._generations = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._entries[key]
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value, now):
+        expires_at = now + self.ttl if self.ttl is not None else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            return value if found else default
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value, time.monotonic())
+
+    def invalidate(self, key):
+        """
+        Xóa key khỏi cache; lần tính đang chạy cho key này sẽ không được lưu
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            if key in self._in_flight:
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def invalidate_matching(self, predicate):
+        """
+        Xóa mọi key thỏa predicate(key), vd: mọi kết quả của một video
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+            for key in self._in_flight:
+                if predicate(key):
+                    self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for key in self._in_flight:
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Lấy giá trị của key, nếu chưa có thì gọi compute() để tính và lưu lại
+
+        Lỗi của compute() được trả cho mọi luồng đang chờ và không được cache.
+        """
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+
+            self.misses += 1
+            in_flight = self._in_flight.get(key)
+            owner = in_flight is None
+            if owner:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+                generation = self._generations.get(key, 0)
+
+        if not owner:
+            in_flight.event.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.value
+
+        try:
+            in_flight.value = compute()
+        except BaseException as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                stale = self._generations.pop(key, 0) != generation
+                if in_flight.error is None and not stale:
+                    self._store(key, in_flight.value, time.monotonic())
+            in_flight.event.set()
+
+        return in_flight.value
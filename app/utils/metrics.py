@@ -0,0 +1,76 @@
+import bisect
+import threading
+from collections import deque
+import numpy as np
+
+
+class LatencyRecorder:
+    """
+    Lưu thời gian xử lý (mili giây) của window lần gần nhất để tính p50/p99,
+    an toàn với nhiều luồng
+    """
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, latency_ms):
+        with self._lock:
+            self._samples.append(latency_ms)
+            self.count += 1
+
+    def summary(self):
+        """
+        Returns:
+            Dict gồm count (tổng số lần), p50, p99, max (ms, trên cửa sổ gần nhất)
+        """
+        with self._lock:
+            samples = np.array(self._samples, dtype=np.float64)
+            count = self.count
+
+        if not len(samples):
+            return {"count": count, "p50": None, "p99": None, "max": None}
+
+        p50, p99 = np.percentile(samples, [50, 99])
+        return {
+            "count": count,
+            "p50": round(float(p50), 2),
+            "p99": round(float(p99), 2),
+            "max": round(float(samples.max()), 2),
+        }
+
+
+class Histogram:
+    """
+    Đếm số giá trị rơi vào từng khoảng (bounds[i-1], bounds[i]], an toàn với
+    nhiều luồng
+    """
+
+    def __init__(self, bounds):
+        self.bounds = sorted(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def summary(self):
+        """
+        Returns:
+            Dict gồm count, sum và buckets ({"<=bound": số giá trị, ...,
+            ">bound cuối": số giá trị})
+        """
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self.count, self.sum
+
+        buckets = {f"<={bound:g}": n for bound, n in zip(self.bounds, counts)}
+        buckets[f">{self.bounds[-1]:g}"] = counts[-1]
+        return {"count": count, "sum": round(total, 2), "buckets": buckets}
@@ -0,0 +1,166 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+
+from config import DEFAULT_PAGE_SIZE, STREAM_YIELD_PER, STREAM_CHUNK_SIZE
+from database import SessionLocal
+
+# Header chứa cursor của trang tiếp theo (không có nếu là trang cuối)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def encode_cursor(*values):
+    """
+    Mã hóa giá trị khóa của dòng cuối trang thành chuỗi cursor
+    """
+    encoded = [
+        {"dt": value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(encoded, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    """
+    Giải mã cursor thành list size giá trị khóa, lỗi 400 nếu cursor không hợp lệ
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = [
+            (datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value)
+            for value in json.loads(raw)
+        ]
+    except (ValueError, TypeError, KeyError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor không hợp lệ"
+        )
+    return values
+
+
+def keyset_filter(columns, values, descending=False):
+    """
+    Điều kiện lấy các dòng đứng sau (values) theo thứ tự của columns:
+    (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+    """
+    conditions = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        after = column < value if descending else column > value
+        equal_prefix = [
+            prefix_column == prefix_value
+            for prefix_column, prefix_value in zip(columns[:i], values[:i])
+        ]
+        conditions.append(and_(*equal_prefix, after))
+    return or_(*conditions)
+
+
+def keyset_query(query, columns, cursor=None, descending=False):
+    """
+    Sắp xếp query theo columns (cột cuối là khóa duy nhất, thường là id) và
+    bỏ qua các dòng đến hết cursor
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(columns))
+        query = query.filter(keyset_filter(columns, values, descending))
+
+    order_by = [column.desc() if descending else column for column in columns]
+    return query.order_by(*order_by)
+
+
+def _page(rows, columns, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(*(getattr(last, column.key) for column in columns))
+
+    return rows, next_cursor
+
+
+def paginate(query, columns, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    """
+    Lấy một trang theo keyset (không dùng OFFSET nên trang sau không chậm dần)
+
+    Returns:
+        (các dòng của trang, cursor của trang tiếp theo hoặc None)
+    """
+    rows = keyset_query(query, columns, cursor, descending).limit(limit + 1).all()
+    return _page(rows, columns, limit)
+
+
+async def paginate_async(
+    db, statement, columns, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False
+):
+    """
+    Giống paginate nhưng với AsyncSession và câu lệnh select()
+    """
+    result = await db.execute(
+        keyset_query(statement, columns, cursor, descending).limit(limit + 1)
+    )
+    return _page(result.scalars().all(), columns, limit)
+
+
+def ndjson_response(items, serialize, on_close=None):
+    """
+    Trả về StreamingResponse NDJSON, mỗi phần tử được chuyển thành một dòng JSON
+    khi gửi đi nên bộ nhớ không tăng theo số dòng
+
+    Args:
+        items: Iterable các phần tử
+        serialize: Hàm chuyển một phần tử thành dict
+        on_close: Hàm gọi khi gửi xong hoặc client ngắt kết nối
+    """
+
+    def generate():
+        try:
+            chunk = []
+            chunk_size = 0
+            for item in items:
+                line = json.dumps(jsonable_encoder(serialize(item)), ensure_ascii=False)
+                chunk.append(line + "\n")
+                chunk_size += len(line) + 1
+                if chunk_size >= STREAM_CHUNK_SIZE:
+                    yield "".join(chunk)
+                    chunk = []
+                    chunk_size = 0
+            if chunk:
+                yield "".join(chunk)
+        finally:
+            if on_close is not None:
+                on_close()
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def stream_query(build_query, serialize, yield_per=STREAM_YIELD_PER):
+    """
+    Trả về kết quả query dạng NDJSON, đọc cursor database theo từng lô yield_per
+
+    Dùng database session riêng vì session của request có thể đã đóng trong
+    khi response vẫn đang được gửi.
+
+    Args:
+        build_query: Hàm nhận session và trả về query
+        serialize: Hàm chuyển một dòng thành dict
+    """
+    db = SessionLocal()
+    try:
+        rows = build_query(db).yield_per(yield_per)
+    except Exception:
+        db.close()
+        raise
+
+    return ndjson_response(rows, serialize, on_close=db.close)
@@ -1,15 +1,26 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models.user import User
 from ..schemas.user import TokenData
-from ..config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..config import (
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    AUTH_CACHE_SIZE,
+    AUTH_CACHE_TTL,
+    PASSWORD_HASH_WORKERS,
+)
+from .cache import TTLCache
 
 # Cấu hình mã hóa mật khẩu
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -17,6 +28,35 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # Cấu hình OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Luồng riêng cho bcrypt (~250 ms mỗi lần) để không chiếm threadpool chung
+# của các handler đồng bộ
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+
+# user_id -> UserPrincipal của người dùng đã xác thực
+principal_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+
+class UserPrincipal:
+    """Thông tin cơ bản của người dùng đã xác thực, không gắn với session"""
+
+    __slots__ = ("id", "username", "email")
+
+    def __init__(self, id: int, username: str, email: str):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    @classmethod
+    def from_user(cls, user: User):
+        return cls(user.id, user.username, user.email)
+
+
+def invalidate_user(user_id: int):
+    """Xóa người dùng khỏi cache, gọi sau khi cập nhật thông tin người dùng"""
+    principal_cache.invalidate(user_id)
+
 
 def verify_password(plain_password, hashed_password):
     """Xác minh mật khẩu"""
@@ -28,12 +68,28 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
-def authenticate_user(db: Session, username: str, password: str):
+async def verify_password_async(plain_password, hashed_password):
+    """Xác minh mật khẩu trong luồng bcrypt riêng"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, verify_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password):
+    """Mã hóa mật khẩu trong luồng bcrypt riêng"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
     """Xác thực người dùng"""
-    user = db.query(User).filter(User.username == username).first()
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt tốn CPU, không chạy trên event loop
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
@@ -52,28 +108,46 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Lấy thông tin người dùng hiện tại từ token"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Không thể xác thực thông tin đăng nhập",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
+async def get_user_from_token(token: str, db: AsyncSession):
+    """
+    Kiểm tra token và lấy UserPrincipal tương ứng, None nếu không hợp lệ
+
+    Chữ ký và hạn của token luôn được kiểm tra; người dùng được lấy từ cache,
+    chỉ query database khi chưa có trong cache
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         user_id: int = payload.get("id")
         
         if username is None or user_id is None:
-            raise credentials_exception
+            return None
             
         token_data = TokenData(username=username, user_id=user_id)
     except JWTError:
-        raise credentials_exception
+        return None
         
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+    principal = principal_cache.get(token_data.user_id)
+    if principal is not None:
+        return principal
+    
+    user = await db.get(User, token_data.user_id)
     if user is None:
-        raise credentials_exception
+        return None
+    
+    principal = UserPrincipal.from_user(user)
+    principal_cache.set(user.id, principal)
+    return principal
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Lấy thông tin người dùng hiện tại (UserPrincipal) từ token"""
+    principal = await get_user_from_token(token, db)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Không thể xác thực thông tin đăng nhập",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
         
-    return user
\ No newline at end of file
+    return principal
@@ -0,0 +1,178 @@
+"""
+So sánh lấy mẫu cố định (interval) với lấy mẫu thích ứng theo chuyển động:
+số khung hình được lấy mẫu, số lần suy luận (khuôn mặt) và thời gian xử lý.
+
+Không truyền video thì tạo một clip tổng hợp gồm các đoạn đứng yên xen kẽ
+những đoạn chuyển động ngắn, và đếm thêm số đoạn chuyển động có ít nhất một
+mẫu. Truyền --image (ảnh có khuôn mặt) để clip tổng hợp có khuôn mặt.
+
+Chạy từ thư mục gốc của project:
+
+    python -m benchmarks.bench_adaptive_sampling
+    python -m benchmarks.bench_adaptive_sampling --image face.jpg
+    python -m benchmarks.bench_adaptive_sampling lecture1.mp4 lecture2.mp4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "app"))
+
+from config import ADAPTIVE_MIN_INTERVAL, ADAPTIVE_MAX_INTERVAL
+from services.emotion_detector import (
+    EmotionDetector,
+    iter_adaptive_frames,
+    iter_sampled_frames,
+)
+
+FPS = 25
+FRAME_SIZE = (640, 360)
+
+
+def synthesize_clip(path, duration, image=None, static=8.0, burst=0.6, seed=0):
+    """
+    Ghi clip gồm các chu kỳ: đứng yên static giây rồi chuyển động burst giây
+
+    Returns:
+        List các đoạn chuyển động (bắt đầu, kết thúc) tính bằng giây
+    """
+    rng = np.random.default_rng(seed)
+    width, height = FRAME_SIZE
+    background = np.tile(
+        np.linspace(60, 140, width, dtype=np.float32), (height, 1)
+    ).astype(np.uint8)
+    background = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+
+    if image is not None:
+        subject = cv2.resize(cv2.imread(image), (200, 200))
+    else:
+        subject = np.full((200, 200, 3), 180, dtype=np.uint8)
+        cv2.ellipse(subject, (100, 100), (70, 90), 0, 0, 360, (90, 120, 200), -1)
+        cv2.circle(subject, (75, 80), 10, (20, 20, 20), -1)
+        cv2.circle(subject, (125, 80), 10, (20, 20, 20), -1)
+
+    bursts = []
+    start = static
+    while start + burst < duration:
+        bursts.append((start, start + burst))
+        start += burst + static
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, FRAME_SIZE)
+    for frame_idx in range(int(duration * FPS)):
+        t = frame_idx / FPS
+        offset_x, offset_y = 0, 0
+        mouth = 10
+        for burst_start, burst_end in bursts:
+            if burst_start <= t < burst_end:
+                phase = (t - burst_start) / burst * 2 * np.pi
+                offset_x = int(40 * np.sin(phase))
+                offset_y = int(15 * np.sin(2 * phase))
+                mouth = 30
+
+        frame = background.copy()
+        x = (width - 200) // 2 + offset_x
+        y = (height - 200) // 2 + offset_y
+        frame[y : y + 200, x : x + 200] = subject
+        if image is None:
+            cv2.ellipse(
+                frame, (x + 100, y + 140), (30, mouth // 2), 0, 0, 360, (40, 40, 40), -1
+            )
+        # Nhiễu cảm biến, không được tính là chuyển động
+        noise = rng.normal(0, 2, frame.shape)
+        frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        writer.write(frame)
+    writer.release()
+
+    return bursts
+
+
+def sampled_times(video_path, options):
+    """Thời điểm (giây) của các khung hình được lấy mẫu, không suy luận"""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if options["adaptive"]:
+        frames = iter_adaptive_frames(cap, fps)
+    else:
+        frames = iter_sampled_frames(
+            cap,
+            max(1, int(fps * options["interval"])),
+            int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        )
+    times = [frame_idx / fps for frame_idx, _ in frames]
+    cap.release()
+    return times
+
+
+def run(detector, video_path, bursts, options):
+    """
+    Returns:
+        (số mẫu, số lần suy luận, giây, số đoạn chuyển động có mẫu)
+    """
+    start = time.perf_counter()
+    results, _ = detector.process_video(video_path, pipelined=False, **options)
+    elapsed = time.perf_counter() - start
+
+    times = sampled_times(video_path, options)
+    covered = None
+    if bursts is not None:
+        # Mẫu lấy ngay sau đoạn chuyển động (trong một chu kỳ đo) vẫn thấy
+        # trạng thái cuối của đoạn đó
+        covered = sum(
+            any(burst_start <= t < burst_end + ADAPTIVE_MIN_INTERVAL for t in times)
+            for burst_start, burst_end in bursts
+        )
+    return len(times), len(results), elapsed, covered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("videos", nargs="*")
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=120.0)
+    parser.add_argument("--image", help="Ảnh khuôn mặt cho clip tổng hợp")
+    parser.add_argument("--backend", default="fake")
+    args = parser.parse_args()
+
+    detector = EmotionDetector(backend=args.backend)
+
+    clips = [(path, None) for path in args.videos]
+    if not clips:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic.avi")
+        bursts = synthesize_clip(path, args.duration, args.image)
+        clips.append((path, bursts))
+
+    modes = [
+        (f"fixed {args.interval:g}s", {"interval": args.interval, "adaptive": False}),
+        (
+            f"fixed {ADAPTIVE_MIN_INTERVAL:g}s",
+            {"interval": ADAPTIVE_MIN_INTERVAL, "adaptive": False},
+        ),
+        (
+            f"adaptive {ADAPTIVE_MIN_INTERVAL:g}-{ADAPTIVE_MAX_INTERVAL:g}s",
+            {"interval": args.interval, "adaptive": True},
+        ),
+    ]
+
+    for path, bursts in clips:
+        print(os.path.basename(path))
+        header = f"  {'mode':<20}{'samples':>10}{'inferences':>12}{'seconds':>10}"
+        if bursts is not None:
+            header += f"{'bursts hit':>12}"
+        print(header)
+
+        for name, options in modes:
+            samples, inferences, elapsed, covered = run(detector, path, bursts, options)
+            line = f"  {name:<20}{samples:>10}{inferences:>12}{elapsed:>10.2f}"
+            if bursts is not None:
+                line += f"{f'{covered}/{len(bursts)}':>12}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
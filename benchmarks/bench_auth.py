@@ -0,0 +1,135 @@
+"""
+Đo thông lượng request đã xác thực (request/giây) của get_current_user khi
+có và không có cache người dùng, và thời gian đăng nhập đồng thời khi bcrypt
+chạy trong luồng riêng.
+
+Mặc định chạy trên một file SQLite tạm; đặt DATABASE_URL (và
+ASYNC_DATABASE_URL) để đo trên MySQL.
+
+    python -m benchmarks.bench_auth --requests 2000 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "app"))
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(), "bench_auth.db"
+    )
+
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi.security import OAuth2PasswordRequestForm
+
+import database
+from app.database import AsyncSessionLocal, get_async_db
+from app.models.user import User
+from app.models.video import Video, EmotionData, SessionData, EmotionReport
+from app.utils import security
+from app.utils.cache import TTLCache
+
+
+def create_app():
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping(current_user=Depends(security.get_current_user)):
+        return {"id": current_user.id}
+
+    @app.post("/token")
+    async def token(
+        form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_async_db)
+    ):
+        user = await security.authenticate_user(
+            db, form_data.username, form_data.password
+        )
+        return {"ok": bool(user)}
+
+    return app
+
+
+async def create_user():
+    async with AsyncSessionLocal() as db:
+        user = User(
+            username="bench",
+            email="bench@example.com",
+            hashed_password=security.get_password_hash("bench-password"),
+        )
+        db.add(user)
+        await db.commit()
+        return user.id, user.username
+
+
+async def run_requests(client, total, concurrency, send):
+    """Gửi total request với concurrency request đồng thời, trả về request/giây"""
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            response = await send(client)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=16)
+    args = parser.parse_args()
+
+    database.Base.metadata.create_all(bind=database.engine)
+    user_id, username = await create_user()
+    access_token = security.create_access_token({"sub": username, "id": user_id})
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def ping(client):
+            return await client.get("/ping", headers=headers)
+
+        # Không cache: phần tử hết hạn ngay nên mỗi request đều query users
+        principal_cache = security.principal_cache
+        security.principal_cache = TTLCache(max_size=1, ttl=0)
+        uncached_rate = await run_requests(
+            client, args.requests, args.concurrency, ping
+        )
+
+        security.principal_cache = principal_cache
+        cached_rate = await run_requests(client, args.requests, args.concurrency, ping)
+
+        print(f"{'authenticated requests':<28}{'req/s':>10}")
+        print(f"{'  no principal cache':<28}{uncached_rate:>10,.0f}")
+        print(f"{'  principal cache':<28}{cached_rate:>10,.0f}")
+
+        async def login(client):
+            return await client.post(
+                "/token", data={"username": username, "password": "bench-password"}
+            )
+
+        # Đăng nhập đồng thời, bcrypt chạy trong các luồng password-hash
+        login_rate = await run_requests(client, args.logins, args.logins, login)
+        print(
+            f"{'concurrent logins':<28}{login_rate:>10,.1f}"
+            f"  ({security.password_executor._max_workers} bcrypt threads)"
+        )
+
+    database.Base.metadata.drop_all(bind=database.engine)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
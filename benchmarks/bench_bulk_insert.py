@@ -0,0 +1,125 @@
+"""
+Đo tốc độ ghi EmotionData (dòng/giây): mỗi dòng một đối tượng ORM + db.add()
+so với bulk_insert_emotions (INSERT nhiều dòng theo lô).
+
+Mặc định chạy trên một file SQLite tạm; dùng --database-url để đo trên MySQL.
+
+    python -m benchmarks.bench_bulk_insert --sizes 10000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "app"))
+
+from config import EMOTION_LABELS
+from database import Base
+# Import đủ các model để SQLAlchemy cấu hình được các relationship
+from models.user import User
+from models.video import Video, EmotionData, SessionData, EmotionReport
+from services.emotion_storage import bulk_insert_emotions
+
+
+def make_results(count):
+    rng = random.Random(0)
+    return [
+        {
+            "timestamp": i / 30.0,
+            "emotion": rng.choice(EMOTION_LABELS),
+            "confidence": rng.random(),
+            "face_coordinates": {"x": 10, "y": 20, "width": 64, "height": 64},
+        }
+        for i in range(count)
+    ]
+
+
+def orm_insert(db, video_id, results):
+    """Cách cũ: mỗi kết quả một đối tượng EmotionData"""
+    for result in results:
+        db.add(
+            EmotionData(
+                video_id=video_id,
+                timestamp=result["timestamp"],
+                emotion=result["emotion"],
+                confidence=result["confidence"],
+                face_coordinates=json.dumps(result["face_coordinates"]),
+            )
+        )
+
+
+def measure(SessionFactory, video_id, insert_fn, results):
+    db = SessionFactory()
+    try:
+        start = time.perf_counter()
+        insert_fn(db, video_id, results)
+        db.commit()
+        elapsed = time.perf_counter() - start
+
+        # Dọn dữ liệu để lần đo sau bắt đầu từ bảng trống
+        db.execute(delete(EmotionData).where(EmotionData.video_id == video_id))
+        db.commit()
+    finally:
+        db.close()
+
+    return len(results) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument(
+        "--skip-orm-above",
+        type=int,
+        default=100_000,
+        help="Bỏ qua cách ORM cho số dòng lớn hơn ngưỡng này (quá chậm)",
+    )
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = "sqlite:///" + os.path.join(
+            tempfile.mkdtemp(), "bench_bulk_insert.db"
+        )
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = SessionFactory()
+    user = User(username="bench", email="bench@example.com", hashed_password="-")
+    db.add(user)
+    db.flush()
+    video = Video(user_id=user.id, filename="bench.mp4", filepath="bench.mp4")
+    db.add(video)
+    db.commit()
+    video_id = video.id
+    db.close()
+
+    print(f"{'rows':>10}{'orm rows/s':>14}{'bulk rows/s':>14}")
+    for size in args.sizes:
+        results = make_results(size)
+
+        orm_rate = None
+        if size <= args.skip_orm_above:
+            orm_rate = measure(SessionFactory, video_id, orm_insert, results)
+        bulk_rate = measure(SessionFactory, video_id, bulk_insert_emotions, results)
+
+        orm_text = f"{orm_rate:>14,.0f}" if orm_rate else f"{'-':>14}"
+        print(f"{size:>10,}{orm_text}{bulk_rate:>14,.0f}")
+
+    Base.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
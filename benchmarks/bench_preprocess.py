@@ -0,0 +1,113 @@
+"""
+So sánh tiền xử lý khuôn mặt cũ (mỗi khuôn mặt tạo 4 mảng tạm) với cách ghi
+thẳng vào buffer NCHW float32 dùng lại của EmotionDetector.
+
+Chạy từ thư mục gốc của project:
+
+    python -m benchmarks.bench_preprocess --faces 32 --repeat 200
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "app"))
+
+from services.emotion_detector import EmotionDetector
+
+
+def legacy_preprocess(gray, faces, input_shape):
+    """Tiền xử lý theo cách cũ: chia 255 ra float64, 2 lần expand_dims, astype"""
+    input_height, input_width = input_shape[2:]
+    processed_faces = []
+
+    for x, y, w, h in faces:
+        resized_face = cv2.resize(
+            gray[y : y + h, x : x + w], (input_width, input_height)
+        )
+        normalized_face = resized_face / 255.0
+        processed_face = np.expand_dims(
+            np.expand_dims(normalized_face, axis=0), axis=0
+        ).astype(np.float32)
+        processed_faces.append(processed_face)
+
+    return np.concatenate(processed_faces, axis=0)
+
+
+def current_preprocess(detector, gray, faces):
+    return detector._fill_batch([detector.crop_faces(gray, faces)])
+
+
+def measure(fn, repeat, num_faces):
+    # Chạy thử một lần để buffer dùng lại đã được cấp phát
+    fn()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "us_per_face": elapsed / (repeat * num_faces) * 1e6,
+        "bytes_per_face": (peak - baseline) / num_faces,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--faces", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    detector = EmotionDetector(backend="fake")
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, size=(1080, 1920), dtype=np.uint8)
+    faces = [
+        (int(x), int(y), int(size), int(size))
+        for x, y, size in zip(
+            rng.integers(0, 1700, args.faces),
+            rng.integers(0, 860, args.faces),
+            rng.integers(40, 200, args.faces),
+        )
+    ]
+
+    # Hai cách phải cho ra cùng một tensor
+    expected = legacy_preprocess(gray, faces, detector.input_shape)
+    actual = current_preprocess(detector, gray, faces)
+    assert np.array_equal(expected, actual)
+
+    results = {
+        "legacy": measure(
+            lambda: legacy_preprocess(gray, faces, detector.input_shape),
+            args.repeat,
+            args.faces,
+        ),
+        "preallocated": measure(
+            lambda: current_preprocess(detector, gray, faces),
+            args.repeat,
+            args.faces,
+        ),
+    }
+
+    print(f"{'method':<14}{'us/face':>10}{'bytes/face':>14}")
+    for name, result in results.items():
+        print(
+            f"{name:<14}{result['us_per_face']:>10.2f}"
+            f"{result['bytes_per_face']:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Kiểm tra lấy mẫu khi chia video cho nhiều tiến trình cho cùng các khung
+hình như khi chạy tuần tự
+
+Chạy từ thư mục gốc của project:
+
+    python -m unittest tests.test_video_sharding
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "app"))
+
+os.environ.setdefault("INFERENCE_BACKEND", "fake")
+
+from services.emotion_detector import (
+    EmotionDetector,
+    iter_adaptive_frames,
+    iter_sampled_frames,
+)
+from services.video_sharding import plan_shards, process_video_sharded
+
+FPS = 25
+FRAME_SIZE = (320, 180)
+NUM_WORKERS = 3
+
+
+def write_clip(path, duration=12.0):
+    """Clip đứng yên xen kẽ các đoạn chuyển động, độ dài khác nhau"""
+    width, height = FRAME_SIZE
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, FRAME_SIZE)
+    bursts = [(1.5, 2.0), (3.7, 4.6), (6.1, 6.4), (8.0, 9.5), (10.2, 10.5)]
+
+    for frame_idx in range(int(duration * FPS)):
+        t = frame_idx / FPS
+        # Hình chữ nhật đi qua lại giữa hai vị trí trong mỗi đoạn chuyển động
+        x = 40
+        for i, (burst_start, burst_end) in enumerate(bursts):
+            progress = min(max((t - burst_start) / (burst_end - burst_start), 0), 1)
+            if progress > 0:
+                x = 40 + int(120 * (progress if i % 2 == 0 else 1 - progress))
+
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)
+        cv2.rectangle(frame, (x, 50), (x + 80, 130), (200, 180, 160), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def sampled_indices(video_path, segments, adaptive, frames_per_interval):
+    """Ghép các frame được lấy mẫu của từng đoạn, như các worker chạy riêng"""
+    indices = []
+    for start_frame, end_frame in segments:
+        cap = cv2.VideoCapture(video_path)
+        if adaptive:
+            frames = iter_adaptive_frames(
+                cap, FPS, start_frame=start_frame, end_frame=end_frame
+            )
+        else:
+            frames = iter_sampled_frames(
+                cap,
+                frames_per_interval,
+                int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+                "grab",
+                start_frame,
+                end_frame,
+            )
+        indices.extend(frame_idx for frame_idx, _ in frames)
+        cap.release()
+    return indices
+
+
+class ShardedSamplingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.video_path = os.path.join(cls.tmpdir.name, "clip.avi")
+        write_clip(cls.video_path)
+
+        cap = cv2.VideoCapture(cls.video_path)
+        cls.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def assert_matches_serial(self, adaptive):
+        frames_per_interval = FPS
+        serial = sampled_indices(
+            self.video_path, [(0, None)], adaptive, frames_per_interval
+        )
+        sharded = sampled_indices(
+            self.video_path,
+            plan_shards(self.frame_count, frames_per_interval, NUM_WORKERS, adaptive),
+            adaptive,
+            frames_per_interval,
+        )
+        self.assertGreater(len(serial), 1)
+        self.assertEqual(sharded, serial)
+
+    def test_fixed_sampling_matches_serial(self):
+        self.assert_matches_serial(adaptive=False)
+
+    def test_adaptive_sampling_matches_serial(self):
+        self.assert_matches_serial(adaptive=True)
+
+    def test_adaptive_sampling_is_not_split(self):
+        segments = plan_shards(self.frame_count, FPS, NUM_WORKERS, adaptive=True)
+        self.assertEqual(segments, [(0, None)])
+
+    def test_process_video_sharded_matches_serial(self):
+        serial, serial_duration = EmotionDetector(backend="fake").process_video(
+            self.video_path, pipelined=False, adaptive=True
+        )
+        sharded, sharded_duration = process_video_sharded(
+            self.video_path, num_workers=NUM_WORKERS, backend="fake", adaptive=True
+        )
+        self.assertEqual(sharded_duration, serial_duration)
+        self.assertEqual(sharded, serial)
+
+
+if __name__ == "__main__":
+    unittest.main()